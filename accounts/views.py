@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from medaid.admission import admission_control
 from .forms import AdminRegistrationForm, CustomLoginForm
 
 def landing_page(request):
     return render(request, 'accounts/landing.html')
 
+@admission_control('light')
 def login_view(request):
     if request.method == 'POST':
         form = CustomLoginForm(request, data=request.POST)
@@ -0,0 +1,144 @@
+"""Admission control for slow views.
+
+Views are assigned to named pools (settings.ADMISSION_POOLS), each with its own
+concurrency cap and bounded wait queue. Slow AI predictions run in the small
+"heavy" pool, so they can never take every worker thread away from cheap
+pages like dashboards and login. A request that finds the queue full is turned
+away at once, and one that waits in the queue longer than the pool timeout
+gives up; both get a 503 with Retry-After instead of piling up.
+"""
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render
+
+DEFAULT_POOLS = {
+    'heavy': {'concurrency': 4, 'queue': 2, 'timeout': 5.0},
+    'light': {'concurrency': 32, 'queue': 64, 'timeout': 2.0},
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, pool, reason):
+        super().__init__(f"{pool} pool overloaded ({reason})")
+        self.pool = pool
+        self.reason = reason
+
+
+class AdmissionPool:
+    def __init__(self, name, concurrency, queue, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.queue_size:
+                    self.rejected_queue_full += 1
+                    raise Overloaded(self.name, 'queue full')
+                self.waiting += 1
+                self.queued += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.rejected_timeout += 1
+                raise Overloaded(self.name, 'timed out waiting')
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                config = {**DEFAULT_POOLS, **getattr(settings, 'ADMISSION_POOLS', {})}[name]
+                pool = _pools[name] = AdmissionPool(name, **config)
+    return pool
+
+
+def metrics():
+    """Per-pool counters for this process"""
+    names = {**DEFAULT_POOLS, **getattr(settings, 'ADMISSION_POOLS', {})}
+    return {name: get_pool(name).snapshot() for name in names}
+
+
+@contextmanager
+def admit(pool_name):
+    """Hold a slot in the pool for the duration of the block; raises Overloaded"""
+    pool = get_pool(pool_name)
+    pool.acquire()
+    try:
+        yield
+    finally:
+        pool.release()
+
+
+def wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
+
+
+def overloaded_response(request, error):
+    retry_after = max(1, int(get_pool(error.pool).timeout))
+    if wants_json(request):
+        response = JsonResponse({'error': 'Server busy, please retry.', 'reason': error.reason}, status=503)
+    else:
+        response = render(request, 'busy.html', {'retry_after': retry_after}, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_control(pool_name, methods=None):
+    """View decorator: run the view inside `pool_name`, optionally only for some HTTP methods"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if methods and request.method not in methods:
+                return view_func(request, *args, **kwargs)
+            try:
+                with admit(pool_name):
+                    return view_func(request, *args, **kwargs)
+            except Overloaded as e:
+                return overloaded_response(request, e)
+        return wrapper
+    return decorator
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'medaid.sharding.ClinicShardMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -53,6 +55,23 @@ DATABASES = {
     }
 }
 
+# One database per clinic, e.g. CLINIC_SHARDS=north,south -> shards/north.sqlite3, shards/south.sqlite3
+CLINIC_SHARDS = [name.strip() for name in os.getenv('CLINIC_SHARDS', '').split(',') if name.strip()]
+SHARDS_DIR = BASE_DIR / 'shards'
+if CLINIC_SHARDS:
+    # SQLite creates the database file on first connect, but not its directory
+    SHARDS_DIR.mkdir(exist_ok=True)
+for clinic in CLINIC_SHARDS:
+    DATABASES[f'clinic_{clinic}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SHARDS_DIR / f'{clinic}.sqlite3',
+    }
+if sys.argv[1:2] == ['test']:
+    # Spare database for the sharding tests; they switch it on with override_settings(CLINIC_SHARDS=['test'])
+    DATABASES.setdefault('clinic_test', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'})
+DATABASE_ROUTERS = ['medaid.sharding.ClinicShardRouter']
+AUTHENTICATION_BACKENDS = ['medaid.sharding.ShardedModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = []
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Asia/Kolkata'
@@ -67,4 +86,32 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.CustomUser'
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+STARTUP_TIME_BUDGET = float(os.getenv('STARTUP_TIME_BUDGET', '2.0'))
+
+AUDIT_LOG_DIR = BASE_DIR / 'audit_log'
+AUDIT_FLUSH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 2.0
+AUDIT_SEGMENT_BYTES = 16 * 1024 * 1024
+# Events held in memory while the log directory is unwritable; older ones are dropped beyond this
+AUDIT_MAX_BUFFER = 100_000
+
+# Kept outside MEDIA_ROOT so patient reports are never served as static media
+REPORTS_DIR = BASE_DIR / 'report_cache'
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+
+# Per-process admission budgets. Requests waiting in a queue still hold a server
+# thread, so heavy concurrency + queue must stay below the threads per worker
+# (e.g. gunicorn --threads 8 leaves at least 2 threads for light views here).
+ADMISSION_POOLS = {
+    'heavy': {
+        'concurrency': int(os.getenv('ADMISSION_HEAVY_CONCURRENCY', '4')),
+        'queue': int(os.getenv('ADMISSION_HEAVY_QUEUE', '2')),
+        'timeout': 5.0,
+    },
+    'light': {
+        'concurrency': int(os.getenv('ADMISSION_LIGHT_CONCURRENCY', '32')),
+        'queue': int(os.getenv('ADMISSION_LIGHT_QUEUE', '64')),
+        'timeout': 2.0,
+    },
+}
 LOGIN_URL = 'login'
@@ -0,0 +1,157 @@
+"""Per-clinic database sharding.
+
+Each clinic listed in settings.CLINIC_SHARDS gets its own database alias
+(``clinic_<name>``). A clinic's admins, the patients they register and all of
+those patients' records live together in that clinic's database, so foreign
+keys never cross databases. Accounts that have not been moved into a clinic
+stay in ``default``.
+
+The shard for a request is resolved lazily from the session (set at login),
+so requests that never touch the database never load the session either.
+Sessions themselves are always stored in ``default``.
+"""
+import contextvars
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+SHARD_PREFIX = 'clinic_'
+SESSION_KEY = '_clinic_shard'
+
+# Apps that must stay in the default database regardless of clinic
+UNSHARDED_APPS = {'sessions'}
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def shard_alias(clinic):
+    return f'{SHARD_PREFIX}{clinic}'
+
+
+def clinic_aliases():
+    return [shard_alias(clinic) for clinic in getattr(settings, 'CLINIC_SHARDS', [])]
+
+
+def shard_aliases():
+    """Every database that can hold clinic data, default first"""
+    return ['default', *clinic_aliases()]
+
+
+def current_shard():
+    value = _current_shard.get()
+    if callable(value):
+        value = value()
+        _current_shard.set(value)
+    return value or 'default'
+
+
+@contextmanager
+def using_shard(alias):
+    """Route all sharded queries inside the block to `alias`"""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+class ClinicShardRouter:
+    def _route(self, model, **hints):
+        if model._meta.app_label in UNSHARDED_APPS:
+            return 'default'
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return current_shard()
+
+    db_for_read = _route
+    db_for_write = _route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._state.db and obj2._state.db:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label in UNSHARDED_APPS:
+            return db == 'default'
+        return None
+
+
+class ClinicShardMiddleware:
+    """Route each request's queries to the shard of the logged-in user.
+
+    Must come after SessionMiddleware and before AuthenticationMiddleware so
+    the user itself is loaded from the right shard.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        aliases = set(clinic_aliases())
+
+        def resolve():
+            alias = request.session.get(SESSION_KEY)
+            return alias if alias in aliases else 'default'
+
+        token = _current_shard.set(resolve if aliases else 'default')
+        try:
+            return self.get_response(request)
+        finally:
+            _current_shard.reset(token)
+
+
+class ShardedModelBackend(ModelBackend):
+    """Looks a username up in each shard in turn; usernames are unique per shard.
+
+    Clinic shards are tried before ``default`` and the first shard that has the
+    username decides, so an account moved by ``migrate_shards --move-admin``
+    wins over a copy left behind in default, old password included.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        for alias in [*clinic_aliases(), 'default']:
+            with using_shard(alias):
+                user = super().authenticate(request, username=username, password=password, **kwargs)
+                if user is not None or UserModel._default_manager.filter(
+                        **{UserModel.USERNAME_FIELD: username}).exists():
+                    return user
+        return None
+
+
+@receiver(user_logged_in)
+def remember_user_shard(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        request.session[SESSION_KEY] = user._state.db or 'default'
+
+
+def for_each_shard(func):
+    """Call func(alias) once per shard and return {alias: result}"""
+    results = {}
+    for alias in shard_aliases():
+        with using_shard(alias):
+            results[alias] = func(alias)
+    return results
+
+
+def global_count(model, **filters):
+    """COUNT(*) summed across all shards"""
+    return sum(for_each_shard(lambda alias: model._default_manager.using(alias).filter(**filters).count()).values())
+
+
+def global_aggregate(model, filters=None, **aggregates):
+    """Run .aggregate() on every shard and sum each result across shards.
+
+    Only additive aggregates (Count, Sum) are meaningful when summed.
+    """
+    per_shard = for_each_shard(
+        lambda alias: model._default_manager.using(alias).filter(**(filters or {})).aggregate(**aggregates)
+    )
+    return {name: sum(result[name] or 0 for result in per_shard.values()) for name in aggregates}
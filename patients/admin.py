@@ -1,6 +1,78 @@
 from django.contrib import admin
-from .models import PatientProfile, SymptomRecord, DiseasePrediction
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+from .models import CanonicalSymptom, PatientProfile, SymptomRecord, DiseasePrediction
 
-admin.site.register(PatientProfile)
-admin.site.register(SymptomRecord)
-admin.site.register(DiseasePrediction)
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids COUNT(*) on large unfiltered changelists.
+
+    Filtered querysets, and tables below EXACT_COUNT_THRESHOLD rows, are still
+    counted exactly.
+    """
+    EXACT_COUNT_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None or queryset.query.where:
+            return super().count
+        estimate = self._estimate_rows(queryset)
+        if estimate is None or estimate < self.EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate_rows(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        # Auto-increment keys make MAX(pk) an index-only upper bound on the row count
+        return queryset.model._default_manager.using(queryset.db).aggregate(rows=Max('pk'))['rows']
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(PatientProfile)
+class PatientProfileAdmin(LargeTableAdmin):
+    list_display = ['user', 'registered_by', 'blood_group', 'registration_date']
+    list_select_related = ['user', 'registered_by']
+    list_filter = ['registration_date']
+    search_fields = ['=user__username']
+    autocomplete_fields = ['user', 'registered_by']
+
+
+@admin.register(SymptomRecord)
+class SymptomRecordAdmin(LargeTableAdmin):
+    list_display = ['symptom_name', 'patient', 'severity', 'duration_days', 'recorded_date']
+    list_select_related = ['patient']
+    list_filter = ['severity', 'recorded_date']
+    search_fields = ['^symptom_name', '=patient__username']
+    autocomplete_fields = ['patient']
+    raw_id_fields = ['recorded_by']
+
+
+@admin.register(DiseasePrediction)
+class DiseasePredictionAdmin(LargeTableAdmin):
+    list_display = ['predicted_disease', 'patient', 'risk_level', 'confidence_score', 'prediction_date']
+    list_select_related = ['patient']
+    list_filter = ['risk_level', 'prediction_date']
+    search_fields = ['^predicted_disease', '=patient__username']
+    autocomplete_fields = ['patient']
+    raw_id_fields = ['predicted_by']
+
+
+@admin.register(CanonicalSymptom)
+class CanonicalSymptomAdmin(admin.ModelAdmin):
+    list_display = ['name', 'synonyms']
+    search_fields = ['name']
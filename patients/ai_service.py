@@ -3,11 +3,16 @@
 import json
 from django.conf import settings
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+_genai = None
+
+
+def _load_genai():
+    """Import the Gemini SDK on first use - it is slow to import and most processes never need it"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        _genai = genai
+    return _genai
 
 
 def predict_disease_with_ai(symptoms_list, patient_age, patient_gender, duration_days):
@@ -17,7 +22,9 @@ def predict_disease_with_ai(symptoms_list, patient_age, patient_gender, duration
     print("[Gemini AI] Starting prediction...")
     print("="*60)
     
-    if not GEMINI_AVAILABLE:
+    try:
+        genai = _load_genai()
+    except ImportError:
         print("[ERROR] google-generativeai not installed")
         return {
             "primary_diagnosis": "Module Missing",
@@ -0,0 +1,352 @@
+import base64
+import json
+from functools import wraps
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+from accounts.models import CustomUser
+from .models import SymptomRecord, DiseasePrediction, ChangeLogEntry
+from .forms import SymptomRecordForm
+from .audit import audit
+from .signals import symptoms_bulk_created
+from .vocabulary import canonicalize
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+MAX_BULK_SYMPTOMS = 100
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# Each resource maps a public field name to (model columns it needs, getter).
+# `fields=` selects a subset, which also narrows the SELECT via .only().
+PATIENT_FIELDS = {
+    'id': (['id'], lambda u: u.id),
+    'username': (['username'], lambda u: u.username),
+    'first_name': (['first_name'], lambda u: u.first_name),
+    'last_name': (['last_name'], lambda u: u.last_name),
+    'email': (['email'], lambda u: u.email),
+    'phone_number': (['phone_number'], lambda u: u.phone_number),
+    'age': (['age'], lambda u: u.age),
+    'gender': (['gender'], lambda u: u.gender),
+    'date_of_birth': (['date_of_birth'], lambda u: u.date_of_birth),
+    'blood_group': (['patientprofile__blood_group'], lambda u: _profile(u, 'blood_group')),
+    'medical_history': (['patientprofile__medical_history'], lambda u: _profile(u, 'medical_history')),
+    'emergency_contact': (['patientprofile__emergency_contact'], lambda u: _profile(u, 'emergency_contact')),
+    'registration_date': (['patientprofile__registration_date'], lambda u: _profile(u, 'registration_date')),
+    'registered_by': (['patientprofile__registered_by'], lambda u: _profile(u, 'registered_by_id')),
+}
+
+SYMPTOM_FIELDS = {
+    'id': (['id'], lambda s: s.id),
+    'patient': (['patient'], lambda s: s.patient_id),
+    'symptom_name': (['symptom_name'], lambda s: s.symptom_name),
+    'canonical_symptom': (['canonical_symptom'], lambda s: s.canonical_symptom_id),
+    'severity': (['severity'], lambda s: s.severity),
+    'severity_display': (['severity'], lambda s: s.get_severity_display()),
+    'duration_days': (['duration_days'], lambda s: s.duration_days),
+    'recorded_date': (['recorded_date'], lambda s: s.recorded_date),
+    'recorded_by': (['recorded_by'], lambda s: s.recorded_by_id),
+    'notes': (['notes'], lambda s: s.notes),
+}
+
+PREDICTION_FIELDS = {
+    'id': (['id'], lambda p: p.id),
+    'patient': (['patient'], lambda p: p.patient_id),
+    'predicted_disease': (['predicted_disease'], lambda p: p.predicted_disease),
+    'confidence_score': (['confidence_score'], lambda p: p.confidence_score),
+    'risk_level': (['risk_level'], lambda p: p.risk_level),
+    'symptoms_analyzed': (['symptoms_analyzed'], lambda p: p.symptoms_analyzed),
+    'recommendations': (['recommendations'], lambda p: p.recommendations.splitlines()),
+    'further_diagnostics': (['further_diagnostics'], lambda p: p.further_diagnostics.splitlines()),
+    'specialist_referral': (['specialist_referral'], lambda p: p.specialist_referral),
+    'prediction_date': (['prediction_date'], lambda p: p.prediction_date),
+    'predicted_by': (['predicted_by'], lambda p: p.predicted_by_id),
+}
+
+# Heavy text columns are left out unless explicitly requested with fields=
+DEFAULT_PREDICTION_FIELDS = [name for name in PREDICTION_FIELDS if name != 'symptoms_analyzed']
+
+
+def _profile(user, attr):
+    try:
+        return getattr(user.patientprofile, attr)
+    except CustomUser.patientprofile.RelatedObjectDoesNotExist:
+        return None
+
+
+def api_view(view_func):
+    """Session-authenticated JSON view; turns ApiError into a JSON error response"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': e.message}, status=e.status)
+    return wrapper
+
+
+def _require_admin(request):
+    if request.user.user_type != 'admin':
+        raise ApiError('Access denied. Admin only.', status=403)
+
+
+def _get_patient(request, patient_id):
+    if request.user.user_type != 'admin' and request.user.id != patient_id:
+        raise ApiError('Access denied.', status=403)
+    return get_object_or_404(CustomUser, id=patient_id, user_type='patient')
+
+
+def _selected_fields(request, spec, default=None):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default or spec)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in spec]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _only(queryset, spec, names, extra=()):
+    columns = {'id', *extra}
+    for name in names:
+        columns.update(spec[name][0])
+    return queryset.only(*columns)
+
+
+def _serialize(obj, spec, names):
+    return {name: spec[name][1](obj) for name in names}
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('Invalid cursor.')
+
+
+def _paginate(request, queryset, serialize):
+    """Keyset pagination on descending primary key - no OFFSET or COUNT(*)"""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit must be an integer.')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by('-pk')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        queryset = queryset.filter(pk__lt=_decode_cursor(cursor))
+
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return JsonResponse({
+        'results': [serialize(row) for row in rows],
+        'next_cursor': _encode_cursor(rows[-1].pk) if has_more else None,
+    })
+
+
+def _patient_queryset(request, names):
+    queryset = CustomUser.objects.filter(user_type='patient')
+    if any(column.startswith('patientprofile__') for name in names for column in PATIENT_FIELDS[name][0]):
+        queryset = queryset.select_related('patientprofile')
+    queryset = _only(queryset, PATIENT_FIELDS, names)
+    include = {part.strip() for part in request.GET.get('include', '').split(',') if part.strip()}
+    unknown = include - {'symptoms', 'predictions'}
+    if unknown:
+        raise ApiError(f"Unknown include: {', '.join(sorted(unknown))}")
+    if 'symptoms' in include:
+        queryset = queryset.prefetch_related(Prefetch('symptoms', queryset=SymptomRecord.objects.order_by('-pk')))
+    if 'predictions' in include:
+        queryset = queryset.prefetch_related(Prefetch(
+            'predictions', queryset=DiseasePrediction.objects.order_by('-pk').defer('ai_response', 'symptoms_analyzed')
+        ))
+    return queryset, include
+
+
+def _patient_serializer(names, include):
+    def serialize(user):
+        data = _serialize(user, PATIENT_FIELDS, names)
+        if 'symptoms' in include:
+            data['symptoms'] = [_serialize(s, SYMPTOM_FIELDS, list(SYMPTOM_FIELDS)) for s in user.symptoms.all()]
+        if 'predictions' in include:
+            data['predictions'] = [_serialize(p, PREDICTION_FIELDS, DEFAULT_PREDICTION_FIELDS)
+                                   for p in user.predictions.all()]
+        return data
+    return serialize
+
+
+@api_view
+@require_http_methods(["GET"])
+def patient_list(request):
+    """GET /api/patients/ - admin only, cursor paginated"""
+    _require_admin(request)
+    names = _selected_fields(request, PATIENT_FIELDS)
+    queryset, include = _patient_queryset(request, names)
+    search = request.GET.get('search')
+    if search:
+        queryset = queryset.filter(username__icontains=search)
+    return _paginate(request, queryset, _patient_serializer(names, include))
+
+
+@api_view
+@require_http_methods(["GET"])
+def patient_detail(request, patient_id):
+    """GET /api/patients/<id>/"""
+    if request.user.user_type != 'admin' and request.user.id != patient_id:
+        raise ApiError('Access denied.', status=403)
+    names = _selected_fields(request, PATIENT_FIELDS)
+    queryset, include = _patient_queryset(request, names)
+    patient = get_object_or_404(queryset, id=patient_id)
+    return JsonResponse(_patient_serializer(names, include)(patient))
+
+
+def _parse_symptom_payload(request):
+    try:
+        payload = json.loads(request.body or b'null')
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError('Request body must be valid JSON.')
+    if isinstance(payload, dict):
+        payload = payload.get('symptoms', [payload])
+    if not isinstance(payload, list) or not payload:
+        raise ApiError('Expected a symptom object or a non-empty list of symptoms.')
+    if len(payload) > MAX_BULK_SYMPTOMS:
+        raise ApiError(f'At most {MAX_BULK_SYMPTOMS} symptoms per request.')
+    return payload
+
+
+@api_view
+@require_http_methods(["GET", "POST"])
+def patient_symptoms(request, patient_id):
+    """GET lists a patient's symptoms; POST creates one or many in a single insert"""
+    patient = _get_patient(request, patient_id)
+
+    if request.method == 'POST':
+        _require_admin(request)
+        payload = _parse_symptom_payload(request)
+
+        records, errors = [], {}
+        for i, item in enumerate(payload):
+            form = SymptomRecordForm(item if isinstance(item, dict) else {})
+            if form.is_valid():
+                record = form.save(commit=False)
+                record.patient = patient
+                record.recorded_by = request.user
+                records.append(record)
+            else:
+                errors[i] = form.errors.get_json_data()
+        if errors:
+            return JsonResponse({'error': 'Validation failed.', 'errors': errors}, status=400)
+
+        using = patient._state.db
+        with transaction.atomic(using=using):
+            records = SymptomRecord.objects.using(using).bulk_create(canonicalize(records, using=using))
+            symptoms_bulk_created.send(sender=SymptomRecord, patient=patient, records=records, using=using)
+        for record in records:
+            audit(request, 'create', 'symptom', record.id, patient.id)
+
+        names = list(SYMPTOM_FIELDS)
+        return JsonResponse({'results': [_serialize(r, SYMPTOM_FIELDS, names) for r in records]}, status=201)
+
+    names = _selected_fields(request, SYMPTOM_FIELDS)
+    queryset = _only(SymptomRecord.objects.filter(patient=patient), SYMPTOM_FIELDS, names)
+    return _paginate(request, queryset, lambda s: _serialize(s, SYMPTOM_FIELDS, names))
+
+
+@api_view
+@require_http_methods(["DELETE"])
+def symptom_detail(request, symptom_id):
+    """DELETE /api/symptoms/<id>/"""
+    symptom = get_object_or_404(SymptomRecord, id=symptom_id)
+    if request.user.user_type != 'admin' and symptom.patient_id != request.user.id:
+        raise ApiError('Access denied.', status=403)
+    audit(request, 'delete', 'symptom', symptom.id, symptom.patient_id)
+    symptom.delete()
+    return HttpResponse(status=204)
+
+
+@api_view
+@require_http_methods(["GET"])
+def patient_predictions(request, patient_id):
+    """GET /api/patients/<id>/predictions/"""
+    patient = _get_patient(request, patient_id)
+    names = _selected_fields(request, PREDICTION_FIELDS, default=DEFAULT_PREDICTION_FIELDS)
+    queryset = _only(DiseasePrediction.objects.filter(patient=patient), PREDICTION_FIELDS, names)
+    return _paginate(request, queryset, lambda p: _serialize(p, PREDICTION_FIELDS, names))
+
+
+@api_view
+@require_http_methods(["GET"])
+def prediction_detail(request, prediction_id):
+    """GET /api/predictions/<id>/"""
+    names = _selected_fields(request, PREDICTION_FIELDS)
+    queryset = _only(DiseasePrediction.objects.all(), PREDICTION_FIELDS, names, extra=['patient'])
+    prediction = get_object_or_404(queryset, id=prediction_id)
+    if request.user.user_type != 'admin' and prediction.patient_id != request.user.id:
+        raise ApiError('Access denied.', status=403)
+    return JsonResponse(_serialize(prediction, PREDICTION_FIELDS, names))
+
+
+CHANGE_FEED_RESOURCES = {
+    'symptom': ('symptoms', SymptomRecord, SYMPTOM_FIELDS, list(SYMPTOM_FIELDS)),
+    'prediction': ('predictions', DiseasePrediction, PREDICTION_FIELDS, DEFAULT_PREDICTION_FIELDS),
+}
+
+
+@api_view
+@require_http_methods(["GET"])
+def patient_changes(request, patient_id):
+    """GET /api/patients/<id>/changes/?since=<seq> - delta of symptoms and predictions"""
+    patient = _get_patient(request, patient_id)
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', DEFAULT_CHANGES_LIMIT))
+    except ValueError:
+        raise ApiError('since and limit must be integers.')
+    limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+
+    entries = list(
+        ChangeLogEntry.objects.filter(patient_id=patient.id, seq__gt=since)
+        .order_by('seq')
+        .values_list('seq', 'record_type', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Collapse to the latest action per record; only the final state matters to the client
+    latest = {}
+    for seq, record_type, object_id, action in entries:
+        latest[(record_type, object_id)] = action
+
+    response = {}
+    for record_type, (key, model, spec, names) in CHANGE_FEED_RESOURCES.items():
+        live_ids = [object_id for (kind, object_id), action in latest.items()
+                    if kind == record_type and action != 'deleted']
+        rows = model.objects.filter(patient=patient).in_bulk(live_ids)
+        deleted = [object_id for (kind, object_id), action in latest.items()
+                   if kind == record_type and (action == 'deleted' or object_id not in rows)]
+        response[key] = {
+            'upserts': [_serialize(row, spec, names) for row in rows.values()],
+            'deleted': deleted,
+        }
+
+    response['cursor'] = entries[-1][0] if entries else since
+    response['has_more'] = has_more
+    return JsonResponse(response)
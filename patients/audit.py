@@ -0,0 +1,174 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+
+
+class AuditLog:
+    """Append-only audit trail of record access.
+
+    record() only appends a tuple to an in-memory deque, so it costs
+    microseconds on the request path. A daemon thread drains the buffer into
+    JSON-lines segment files whenever it reaches flush_size events or every
+    flush_interval seconds, whichever comes first. Each process writes its own
+    segments, so no file is ever shared between writers.
+
+    If the disk stays unwritable the buffer is capped at max_buffer events:
+    the oldest are dropped and counted in `dropped`, so memory stays bounded.
+    """
+
+    def __init__(self, directory, flush_size=500, flush_interval=2.0, segment_bytes=16 * 1024 * 1024,
+                 max_buffer=100_000):
+        self.directory = Path(directory)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._segment = None
+
+    def record(self, user, action, object_type, object_id, patient_id=None):
+        self._ensure_thread()
+        if len(self._buffer) == self._buffer.maxlen:
+            # The deque discards its oldest event to make room
+            self.dropped += 1
+        self._buffer.append((time.time(), user._state.db, user.id, user.username,
+                             action, object_type, object_id, patient_id))
+        if len(self._buffer) >= self.flush_size:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Checked per call so a worker forked after startup gets its own flusher
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._buffer.clear()
+            self._segment = None
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[Audit] Flush failed, will retry: {e}")
+            if self.dropped != self._reported_dropped:
+                print(f"[Audit] Buffer full, dropped {self.dropped - self._reported_dropped} oldest events")
+                self._reported_dropped = self.dropped
+
+    def flush(self):
+        """Write every buffered event to the current segment file"""
+        with self._flush_lock:
+            if not self._buffer:
+                return
+            events = []
+            while self._buffer:
+                events.append(self._buffer.popleft())
+            lines = []
+            for ts, clinic_db, user_id, username, action, object_type, object_id, patient_id in events:
+                lines.append(json.dumps({
+                    'ts': datetime.fromtimestamp(ts, dt_timezone.utc).isoformat(),
+                    'db': clinic_db,
+                    'user_id': user_id,
+                    'username': username,
+                    'action': action,
+                    'object_type': object_type,
+                    'object_id': object_id,
+                    'patient_id': patient_id,
+                }) + '\n')
+            try:
+                segment = self._current_segment()
+                with open(segment, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            except OSError:
+                # Put the events back ahead of anything recorded meanwhile so the next flush retries them,
+                # dropping the oldest of them if the buffer has no room left
+                room = self._buffer.maxlen - len(self._buffer)
+                if room < len(events):
+                    self.dropped += len(events) - room
+                    events = events[len(events) - room:]
+                self._buffer.extendleft(reversed(events))
+                self._segment = None
+                raise
+
+    def _current_segment(self):
+        if self._segment is None or self._segment.stat().st_size >= self.segment_bytes:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+            self._segment = self.directory / f'audit-{stamp}-{os.getpid()}.jsonl'
+            self._segment.touch()
+        return self._segment
+
+    def segments(self):
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('audit-*.jsonl'))
+
+    def query(self, user=None, action=None, object_type=None, object_id=None, patient_id=None,
+              since=None, until=None, db=None):
+        """Yield matching events from all segments, oldest segment first; since/until are aware datetimes"""
+        for segment in self.segments():
+            with open(segment, encoding='utf-8') as f:
+                for line in f:
+                    event = json.loads(line)
+                    if db is not None and event.get('db', 'default') != db:
+                        continue
+                    if user is not None and user not in (event['username'], str(event['user_id'])):
+                        continue
+                    if action is not None and event['action'] != action:
+                        continue
+                    if object_type is not None and event['object_type'] != object_type:
+                        continue
+                    if object_id is not None and event['object_id'] != object_id:
+                        continue
+                    if patient_id is not None and event['patient_id'] != patient_id:
+                        continue
+                    if since is not None or until is not None:
+                        ts = datetime.fromisoformat(event['ts'])
+                        if since is not None and ts < since:
+                            continue
+                        if until is not None and ts >= until:
+                            continue
+                    yield event
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log():
+    global _audit_log
+    if _audit_log is None:
+        with _audit_lock:
+            if _audit_log is None:
+                _audit_log = AuditLog(
+                    directory=getattr(settings, 'AUDIT_LOG_DIR', settings.BASE_DIR / 'audit_log'),
+                    flush_size=getattr(settings, 'AUDIT_FLUSH_SIZE', 500),
+                    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+                    segment_bytes=getattr(settings, 'AUDIT_SEGMENT_BYTES', 16 * 1024 * 1024),
+                    max_buffer=getattr(settings, 'AUDIT_MAX_BUFFER', 100_000),
+                )
+                atexit.register(_audit_log.flush)
+    return _audit_log
+
+
+def audit(request, action, object_type, object_id, patient_id=None):
+    """Record that request.user performed `action` on a record"""
+    get_audit_log().record(request.user, action, object_type, object_id, patient_id)
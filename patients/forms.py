@@ -8,8 +8,10 @@ class SymptomRecordForm(forms.ModelForm):
         fields = ['symptom_name', 'severity', 'duration_days', 'notes']
         widgets = {
             'symptom_name': forms.TextInput(attrs={
-                'class': 'form-control', 
-                'placeholder': 'e.g., Fever, Cough, Headache'
+                'class': 'form-control symptom-autocomplete', 
+                'placeholder': 'e.g., Fever, Cough, Headache',
+                'list': 'symptomSuggestions',
+                'autocomplete': 'off',
             }),
             'severity': forms.Select(attrs={'class': 'form-control'}),
             'duration_days': forms.NumberInput(attrs={
@@ -22,3 +24,12 @@ class SymptomRecordForm(forms.ModelForm):
                 'placeholder': 'Additional information (optional)'
             }),
         }
+
+
+# Batch entry - several symptoms validated together and saved with one bulk insert
+SymptomRecordFormSet = forms.formset_factory(
+    SymptomRecordForm,
+    extra=3,
+    max_num=25,
+    validate_max=True,
+)
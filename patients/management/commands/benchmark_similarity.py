@@ -0,0 +1,83 @@
+import heapq
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from patients.similarity import SymptomSimilarityIndex, symptom_weight
+
+
+class Command(BaseCommand):
+    help = "Time similar-patient queries against a synthetic in-memory index and report recall against brute force"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=300_000)
+        parser.add_argument('--symptoms', type=int, default=4, help="Symptoms per patient")
+        parser.add_argument('--common', type=int, default=20, help="Number of very common symptoms")
+        parser.add_argument('--rare', type=int, default=2000, help="Number of long-tail symptoms")
+        parser.add_argument('--common-share', type=float, default=0.85, help="Share of symptoms drawn from the common set")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--budget-ms', type=float, default=50.0, help="Fail if the p95 query time exceeds this")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        common = [f'#{i}' for i in range(options['common'])]
+        rare = [f'#{i}' for i in range(options['common'], options['common'] + options['rare'])]
+
+        vectors = {}
+        for patient_id in range(1, options['patients'] + 1):
+            vector = {}
+            while len(vector) < options['symptoms']:
+                feature = rng.choice(common if rng.random() < options['common_share'] else rare)
+                vector[feature] = symptom_weight(rng.randint(1, 3), rng.randint(1, 30))
+            vectors[patient_id] = vector
+
+        index = SymptomSimilarityIndex(using='benchmark')
+        started = time.perf_counter()
+        index.load(vectors)
+        self.stdout.write(f"Loaded {len(vectors)} patients in {time.perf_counter() - started:.1f}s")
+
+        k = options['k']
+        timings, exact_timings, recalls = [], [], []
+        for patient_id in rng.sample(sorted(vectors), options['queries']):
+            started = time.perf_counter()
+            found = index.similar_patients(patient_id, k=k)
+            timings.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            exact = self.exact_top_k(index, patient_id, k)
+            exact_timings.append((time.perf_counter() - started) * 1000)
+            if exact:
+                # Ties at the k-th score count as hits whichever patient was returned
+                cutoff = exact[-1][1] - 1e-9
+                recalls.append(sum(1 for _, score in found if score >= cutoff) / len(exact))
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{len(timings)} queries, k={k}: median {statistics.median(timings):.1f} ms, "
+            f"p95 {p95:.1f} ms, max {timings[-1]:.1f} ms"
+        )
+        self.stdout.write(
+            f"Brute force: median {statistics.median(exact_timings):.1f} ms, max {max(exact_timings):.1f} ms; "
+            f"recall@{k} of the index against it: {statistics.mean(recalls):.3f}"
+        )
+        if p95 > options['budget_ms']:
+            raise CommandError(f"p95 {p95:.1f} ms is over the {options['budget_ms']:g} ms budget")
+        self.stdout.write(self.style.SUCCESS(f"p95 {p95:.1f} ms (budget {options['budget_ms']:g} ms)"))
+
+    @staticmethod
+    def exact_top_k(index, patient_id, k):
+        """Full scan of every posting the query touches - the reference the index approximates"""
+        query = index._vectors[patient_id]
+        scores = {}
+        for feature, query_weight in query.items():
+            for other_id, weight in index._postings[feature].items():
+                if other_id != patient_id:
+                    scores[other_id] = scores.get(other_id, 0) + query_weight * weight
+        query_norm = index._norms[patient_id]
+        return heapq.nlargest(
+            k, ((other_id, dot / (query_norm * index._norms[other_id])) for other_id, dot in scores.items()),
+            key=lambda item: item[1],
+        )
@@ -0,0 +1,160 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.models import CustomUser
+from medaid.sharding import clinic_aliases, for_each_shard, shard_alias, shard_aliases
+from patients.models import ChangeLogEntry, DiseasePrediction, PatientProfile, SymptomRecord
+from patients.rollups import rebuild_rollups
+from patients.search import index_records
+from patients.vocabulary import canonicalize
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply migrations to every clinic shard, report per-shard row counts, "
+        "or move an admin and the patients they registered into a clinic shard"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help="Print row counts per shard and exit")
+        parser.add_argument('--move-admin', metavar='USERNAME', help="Admin whose clinic data should move")
+        parser.add_argument('--from', dest='source', default='default', help="Source database alias")
+        parser.add_argument('--to', dest='clinic', help="Target clinic name (from CLINIC_SHARDS)")
+        parser.add_argument('--delete-source', action='store_true',
+                            help="Delete the moved rows from the source; on an already moved admin, only that")
+
+    def handle(self, *args, **options):
+        if options['status']:
+            return self.print_status()
+        if options['move_admin']:
+            if not options['clinic']:
+                raise CommandError("--move-admin needs --to <clinic>")
+            return self.move_admin(options['move_admin'], options['source'], shard_alias(options['clinic']),
+                                   options['delete_source'])
+
+        for alias in shard_aliases():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Migrating {alias}"))
+            call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+
+    def print_status(self):
+        models = [CustomUser, PatientProfile, SymptomRecord, DiseasePrediction]
+        counts = for_each_shard(lambda alias: [model.objects.using(alias).count() for model in models])
+        header = f"{'database':<20}" + ''.join(f"{model.__name__:>20}" for model in models)
+        self.stdout.write(header)
+        for alias, row in counts.items():
+            self.stdout.write(f"{alias:<20}" + ''.join(f"{count:>20}" for count in row))
+        totals = [sum(row[i] for row in counts.values()) for i in range(len(models))]
+        self.stdout.write(f"{'total':<20}" + ''.join(f"{count:>20}" for count in totals))
+
+    def move_admin(self, username, source, target, delete_source):
+        if target not in clinic_aliases():
+            raise CommandError(f"Unknown clinic shard '{target}'. Configured: {', '.join(clinic_aliases()) or 'none'}")
+        if source == target:
+            raise CommandError("Source and target are the same database")
+
+        try:
+            admin_user = CustomUser.objects.using(source).get(username=username, user_type='admin')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No admin '{username}' in {source}")
+        patients = list(CustomUser.objects.using(source).filter(patientprofile__registered_by=admin_user))
+        users = [admin_user, *patients]
+
+        clashes = list(CustomUser.objects.using(target)
+                       .filter(username__in=[u.username for u in users])
+                       .values_list('username', flat=True))
+        if clashes:
+            if delete_source and set(clashes) == {u.username for u in users}:
+                return self.purge_source(users, source, target)
+            raise CommandError(f"Usernames already exist in {target}: {', '.join(clashes)}")
+
+        patient_ids = [p.id for p in patients]
+        profiles = list(PatientProfile.objects.using(source).filter(user_id__in=patient_ids))
+        symptoms = list(SymptomRecord.objects.using(source).filter(patient_id__in=patient_ids).order_by('pk'))
+        predictions = list(DiseasePrediction.objects.using(source).filter(patient_id__in=patient_ids).order_by('pk'))
+
+        with transaction.atomic(using=target):
+            # Primary keys are reassigned in the target, so keep a map for the foreign keys
+            user_ids = {}
+            for user in users:
+                old_id = user.pk
+                user.pk = None
+                user._state.adding = True
+                user.save(using=target)
+                user_ids[old_id] = user.pk
+
+            for profile in profiles:
+                profile.user_id = user_ids[profile.user_id]
+                profile.registered_by_id = user_ids.get(profile.registered_by_id)
+            self._copy(PatientProfile, profiles, target, 'registration_date')
+
+            for symptom in symptoms:
+                symptom.patient_id = user_ids[symptom.patient_id]
+                symptom.recorded_by_id = user_ids.get(symptom.recorded_by_id)
+            canonicalize(symptoms, using=target)
+            self._copy(SymptomRecord, symptoms, target, 'recorded_date')
+
+            for prediction in predictions:
+                prediction.patient_id = user_ids[prediction.patient_id]
+                prediction.predicted_by_id = user_ids.get(prediction.predicted_by_id)
+            self._copy(DiseasePrediction, predictions, target, 'prediction_date')
+
+            ChangeLogEntry.objects.using(target).bulk_create(
+                [ChangeLogEntry(patient_id=s.patient_id, record_type='symptom', object_id=s.pk, action='created')
+                 for s in symptoms] +
+                [ChangeLogEntry(patient_id=p.patient_id, record_type='prediction', object_id=p.pk, action='created')
+                 for p in predictions]
+            )
+
+            # bulk_create skips the post_save receivers that keep the search index current
+            index_records('medical_history', profiles, using=target)
+            index_records('symptom_note', symptoms, using=target)
+            index_records('prediction', predictions, using=target)
+
+        rebuild_rollups(using=target)
+        if delete_source:
+            CustomUser.objects.using(source).filter(pk__in=list(user_ids)).delete()
+            rebuild_rollups(using=source)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(users)} users, {len(symptoms)} symptoms and {len(predictions)} predictions "
+            f"from {source} to {target}"
+            + (" and deleted them from the source" if delete_source else "")
+        ))
+        if not delete_source:
+            self.stdout.write(self.style.WARNING(
+                f"The originals are still in {source}. Logins now use the {target} copies; "
+                "rerun with --delete-source once the move is verified."
+            ))
+
+    def purge_source(self, users, source, target):
+        """Delete the source rows of an earlier move, once the target is known to hold all of them"""
+        usernames = [u.username for u in users]
+        for model, field in [(PatientProfile, 'user'), (SymptomRecord, 'patient'), (DiseasePrediction, 'patient')]:
+            lookup = {f'{field}__username__in': usernames}
+            moved = model.objects.using(target).filter(**lookup).count()
+            left = model.objects.using(source).filter(**lookup).count()
+            if moved < left:
+                raise CommandError(
+                    f"{target} holds {moved} {model._meta.verbose_name_plural.lower()} of these users but {source} has "
+                    f"{left}; not deleting anything"
+                )
+
+        CustomUser.objects.using(source).filter(pk__in=[u.pk for u in users]).delete()
+        rebuild_rollups(using=source)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(users)} users were already in {target}; deleted their originals from {source}"
+        ))
+
+    @staticmethod
+    def _copy(model, rows, using, date_field):
+        """bulk_create rows into `using`, keeping their original auto_now_add timestamps"""
+        if not rows:
+            return
+        dates = [getattr(row, date_field) for row in rows]
+        for row in rows:
+            row.pk = None
+            row._state.adding = True
+        model.objects.using(using).bulk_create(rows)
+        for row, value in zip(rows, dates):
+            setattr(row, date_field, value)
+        model.objects.using(using).bulk_update(rows, [date_field], batch_size=500)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from patients.startup import DEFERRED_MODULES, measure_cold_start
+
+
+class Command(BaseCommand):
+    help = "Boot Django in a fresh interpreter and report import time per module"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Number of modules to list")
+        parser.add_argument('--sort', choices=['cumulative', 'self'], default='cumulative')
+        parser.add_argument('--prefix', default='', help="Only list modules starting with this prefix")
+
+    def handle(self, *args, **options):
+        wall, rows = measure_cold_start()
+        column = 2 if options['sort'] == 'cumulative' else 1
+        # The prefix narrows the listing only; the lazy-import check and the count cover every module
+        listed = sorted((row for row in rows if row[0].startswith(options['prefix'])),
+                        key=lambda row: row[column], reverse=True)
+
+        self.stdout.write(f"{'self ms':>10} {'cumul ms':>10}  module")
+        for module, self_us, cumulative_us in listed[:options['top']]:
+            self.stdout.write(f"{self_us / 1000:>10.1f} {cumulative_us / 1000:>10.1f}  {module}")
+
+        imported = {row[0] for row in rows}
+        eager = [name for name in DEFERRED_MODULES if name in imported]
+        if eager:
+            self.stdout.write(self.style.WARNING(f"Imported at startup but should be lazy: {', '.join(eager)}"))
+
+        budget = settings.STARTUP_TIME_BUDGET
+        style = self.style.SUCCESS if wall <= budget else self.style.ERROR
+        self.stdout.write(style(f"Cold start: {wall:.2f}s (budget {budget:.2f}s), {len(rows)} modules imported"))
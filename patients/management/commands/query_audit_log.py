@@ -0,0 +1,52 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from patients.audit import get_audit_log
+
+
+def parse_timestamp(value):
+    """ISO date or date/time as an aware datetime; naive values are taken as UTC"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date/time '{value}', expected ISO format like 2026-10-19T15:00:00Z")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = "Search the audit log segments for record access events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username or user id")
+        parser.add_argument('--database', help="Clinic database alias the user belongs to")
+        parser.add_argument('--action', choices=['view', 'create', 'delete', 'download'])
+        parser.add_argument('--object-type', choices=['patient', 'prediction', 'symptom', 'dashboard'])
+        parser.add_argument('--object-id', type=int)
+        parser.add_argument('--patient', type=int, help="Patient user id")
+        parser.add_argument('--since', help="ISO date/time (UTC), inclusive")
+        parser.add_argument('--until', help="ISO date/time (UTC), exclusive")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many events (0 = no limit)")
+
+    def handle(self, *args, **options):
+        events = get_audit_log().query(
+            user=options['user'],
+            action=options['action'],
+            object_type=options['object_type'],
+            object_id=options['object_id'],
+            patient_id=options['patient'],
+            since=parse_timestamp(options['since']),
+            until=parse_timestamp(options['until']),
+            db=options['database'],
+        )
+        shown = 0
+        for event in events:
+            self.stdout.write(
+                f"{event['ts']}  {event['username']} (#{event['user_id']})  {event['action']} "
+                f"{event['object_type']} #{event['object_id']}"
+                + (f"  patient #{event['patient_id']}" if event['patient_id'] is not None else "")
+            )
+            shown += 1
+            if options['limit'] and shown >= options['limit']:
+                break
+        self.stdout.write(self.style.SUCCESS(f"{shown} event(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from patients.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over notes, medical history and AI explanations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(using=options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} records"))
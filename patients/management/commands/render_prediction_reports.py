@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from medaid.sharding import shard_aliases
+from patients.models import DiseasePrediction
+from patients.reports import render_to_file, report_key, report_path, report_payload
+
+
+class Command(BaseCommand):
+    help = "Pre-render PDF reports for all predictions made on a given day, in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to render, YYYY-MM-DD (default: today)")
+        parser.add_argument('--database', help="Database alias to render from (default: every shard)")
+        parser.add_argument('--workers', type=int, default=settings.REPORT_WORKERS)
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        aliases = [options['database']] if options['database'] else shard_aliases()
+
+        jobs, cached = [], 0
+        for alias in aliases:
+            predictions = (
+                DiseasePrediction.objects.using(alias)
+                .filter(prediction_date__gte=start, prediction_date__lt=start + timedelta(days=1))
+                .select_related('patient')
+            )
+            for prediction in predictions.iterator():
+                payload = report_payload(prediction)
+                path = report_path(report_key(payload))
+                if path.exists():
+                    cached += 1
+                else:
+                    jobs.append((payload, path))
+
+        failed = 0
+        if jobs:
+            with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                futures = {pool.submit(render_to_file, payload, path): payload['prediction_id']
+                           for payload, path in jobs}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"Prediction #{futures[future]}: {type(e).__name__}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{day}: rendered {len(jobs) - failed}, already cached {cached}, failed {failed}"
+        ))
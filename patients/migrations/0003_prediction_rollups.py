@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_alter_diseaseprediction_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day this row counts')),
+                ('predicted_disease', models.CharField(max_length=200)),
+                ('risk_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20)),
+                ('gender', models.CharField(max_length=10)),
+                ('age_band', models.CharField(max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('registered_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Prediction Rollup',
+                'verbose_name_plural': 'Prediction Rollups',
+                'ordering': ['period', 'bucket'],
+                'indexes': [models.Index(fields=['period', 'bucket'], name='rollup_period_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'predicted_disease', 'risk_level', 'gender', 'age_band', 'registered_by'), name='unique_prediction_rollup_bucket')],
+            },
+        ),
+    ]
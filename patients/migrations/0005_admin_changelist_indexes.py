@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_change_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diseaseprediction',
+            index=models.Index(fields=['prediction_date'], name='prediction_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diseaseprediction',
+            index=models.Index(fields=['risk_level', 'prediction_date'], name='prediction_risk_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientprofile',
+            index=models.Index(fields=['registration_date'], name='profile_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomrecord',
+            index=models.Index(fields=['recorded_date'], name='symptom_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomrecord',
+            index=models.Index(fields=['severity', 'recorded_date'], name='symptom_severity_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalSymptom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('synonyms', models.JSONField(blank=True, default=list, help_text='Alternative spellings and lay terms')),
+            ],
+            options={
+                'verbose_name': 'Canonical Symptom',
+                'verbose_name_plural': 'Canonical Symptoms',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='symptomrecord',
+            name='canonical_symptom',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='records', to='patients.canonicalsymptom'),
+        ),
+    ]
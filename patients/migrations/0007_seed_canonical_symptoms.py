@@ -0,0 +1,62 @@
+from django.db import migrations
+
+COMMON_SYMPTOMS = [
+    ('Abdominal Pain', ['stomach ache', 'stomach pain', 'tummy ache', 'belly pain']),
+    ('Back Pain', ['backache', 'lower back pain']),
+    ('Chest Pain', ['chest tightness', 'chest discomfort']),
+    ('Chills', ['shivering', 'rigors']),
+    ('Cough', ['dry cough', 'wet cough', 'coughing']),
+    ('Diarrhea', ['diarrhoea', 'loose motions', 'loose stools']),
+    ('Dizziness', ['vertigo', 'lightheadedness', 'giddiness']),
+    ('Fatigue', ['tiredness', 'weakness', 'exhaustion', 'lethargy']),
+    ('Fever', ['high temp', 'high temperature', 'pyrexia', 'feverish']),
+    ('Headache', ['head ache', 'migraine', 'head pain']),
+    ('Joint Pain', ['arthralgia', 'aching joints']),
+    ('Loss of Appetite', ['anorexia', 'not hungry']),
+    ('Muscle Pain', ['myalgia', 'body ache', 'body pain']),
+    ('Nausea', ['feeling sick', 'queasiness']),
+    ('Rash', ['skin rash', 'hives', 'skin eruption']),
+    ('Runny Nose', ['rhinorrhea', 'nasal discharge']),
+    ('Shortness of Breath', ['breathlessness', 'dyspnea', 'difficulty breathing']),
+    ('Sore Throat', ['throat pain', 'pharyngitis', 'scratchy throat']),
+    ('Sweating', ['night sweats', 'diaphoresis']),
+    ('Vomiting', ['throwing up', 'emesis']),
+    ('Weight Loss', ['losing weight']),
+]
+
+
+def seed_symptoms(apps, schema_editor):
+    CanonicalSymptom = apps.get_model('patients', 'CanonicalSymptom')
+    db = schema_editor.connection.alias
+    CanonicalSymptom.objects.using(db).bulk_create(
+        [CanonicalSymptom(name=name, synonyms=synonyms) for name, synonyms in COMMON_SYMPTOMS],
+        ignore_conflicts=True,
+    )
+
+
+def link_existing_records(apps, schema_editor):
+    CanonicalSymptom = apps.get_model('patients', 'CanonicalSymptom')
+    SymptomRecord = apps.get_model('patients', 'SymptomRecord')
+    db = schema_editor.connection.alias
+
+    by_term = {}
+    for symptom in CanonicalSymptom.objects.using(db).all():
+        for term in [symptom.name, *symptom.synonyms]:
+            by_term.setdefault(' '.join(term.lower().split()), symptom.id)
+
+    records = list(SymptomRecord.objects.using(db).only('id', 'symptom_name'))
+    for record in records:
+        record.canonical_symptom_id = by_term.get(' '.join(record.symptom_name.lower().split()))
+    SymptomRecord.objects.using(db).bulk_update(records, ['canonical_symptom'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0006_canonical_symptoms'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_symptoms, migrations.RunPython.noop),
+        migrations.RunPython(link_existing_records, migrations.RunPython.noop),
+    ]
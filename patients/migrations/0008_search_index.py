@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0007_seed_canonical_symptoms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_count', models.BigIntegerField(default=0)),
+                ('total_length', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Search Stats',
+                'verbose_name_plural': 'Search Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('symptom_note', 'Symptom Notes'), ('medical_history', 'Medical History'), ('prediction', 'AI Explanation')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('patient_id', models.BigIntegerField(db_index=True)),
+                ('length', models.PositiveIntegerField(help_text='Number of indexed terms')),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'constraints': [models.UniqueConstraint(fields=('doc_type', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('positions', models.JSONField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='patients.searchdocument')),
+            ],
+            options={
+                'verbose_name': 'Search Posting',
+                'verbose_name_plural': 'Search Postings',
+                'indexes': [models.Index(fields=['term', 'document'], name='posting_term_doc_idx')],
+            },
+        ),
+    ]
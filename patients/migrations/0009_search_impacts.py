@@ -0,0 +1,73 @@
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+# BM25 parameters, as in patients.search at the time of this migration
+K1 = 1.2
+B = 0.75
+
+
+def backfill_postings(apps, schema_editor):
+    db = schema_editor.connection.alias
+    SearchDocument = apps.get_model('patients', 'SearchDocument')
+    SearchPosting = apps.get_model('patients', 'SearchPosting')
+    SearchStats = apps.get_model('patients', 'SearchStats')
+    SearchTerm = apps.get_model('patients', 'SearchTerm')
+
+    stats = SearchStats.objects.using(db).filter(pk=1).first()
+    average_length = stats.total_length / stats.document_count if stats and stats.document_count else 1
+    document = SearchDocument.objects.using(db).filter(pk=OuterRef('document_id'))
+    tf = Cast('frequency', FloatField())
+    length = Cast(Subquery(document.values('length')[:1]), FloatField())
+    SearchPosting.objects.using(db).update(
+        patient_id=Subquery(document.values('patient_id')[:1]),
+        impact=tf * (K1 + 1) / (tf + K1 * (1 - B) + K1 * B * length / average_length),
+    )
+    SearchTerm.objects.using(db).bulk_create(
+        [SearchTerm(term=term, document_count=count) for term, count in
+         SearchPosting.objects.using(db).values('term').annotate(n=Count('id')).values_list('term', 'n')],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='patient_id',
+            field=models.BigIntegerField(default=0, help_text='Copied from the document so patient searches skip the join'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='searchposting',
+            name='impact',
+            field=models.FloatField(default=0.0, help_text='BM25 term weight without idf, at indexing time'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, unique=True)),
+                ('document_count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Search Term',
+                'verbose_name_plural': 'Search Terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', '-impact'], name='posting_term_impact_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['patient_id', 'term'], name='posting_patient_term_idx'),
+        ),
+        migrations.RunPython(backfill_postings, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,22 @@ class PatientProfile(models.Model):
     class Meta:
         verbose_name = 'Patient Profile'
         verbose_name_plural = 'Patient Profiles'
+        indexes = [
+            models.Index(fields=['registration_date'], name='profile_registered_idx'),
+        ]
+
+
+class CanonicalSymptom(models.Model):
+    name = models.CharField(max_length=200, unique=True)
+    synonyms = models.JSONField(default=list, blank=True, help_text="Alternative spellings and lay terms")
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Canonical Symptom'
+        verbose_name_plural = 'Canonical Symptoms'
 
 
 class SymptomRecord(models.Model):
@@ -26,6 +42,7 @@ class SymptomRecord(models.Model):
     
     patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='symptoms')
     symptom_name = models.CharField(max_length=200)
+    canonical_symptom = models.ForeignKey(CanonicalSymptom, on_delete=models.SET_NULL, null=True, blank=True, related_name='records')
     severity = models.IntegerField(choices=SEVERITY_CHOICES, default=2)
     duration_days = models.IntegerField(help_text="How many days has this symptom persisted?")
     recorded_date = models.DateTimeField(auto_now_add=True)
@@ -39,6 +56,10 @@ class SymptomRecord(models.Model):
         ordering = ['-recorded_date']
         verbose_name = 'Symptom Record'
         verbose_name_plural = 'Symptom Records'
+        indexes = [
+            models.Index(fields=['recorded_date'], name='symptom_recorded_idx'),
+            models.Index(fields=['severity', 'recorded_date'], name='symptom_severity_idx'),
+        ]
 
 
 class DiseasePrediction(models.Model):
@@ -68,3 +89,160 @@ class DiseasePrediction(models.Model):
         ordering = ['-prediction_date']
         verbose_name = 'Disease Prediction'
         verbose_name_plural = 'Disease Predictions'
+        indexes = [
+            models.Index(fields=['prediction_date'], name='prediction_date_idx'),
+            models.Index(fields=['risk_level', 'prediction_date'], name='prediction_risk_idx'),
+        ]
+
+
+AGE_BANDS = [
+    (0, 17, '0-17'),
+    (18, 29, '18-29'),
+    (30, 44, '30-44'),
+    (45, 59, '45-59'),
+    (60, None, '60+'),
+]
+
+
+def age_band(age):
+    """Map an age in years onto one of AGE_BANDS"""
+    if age is None:
+        return 'unknown'
+    for low, high, label in AGE_BANDS:
+        if age >= low and (high is None or age <= high):
+            return label
+    return 'unknown'
+
+
+class PredictionRollup(models.Model):
+    PERIOD_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+    
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField(help_text="Start of the hour/day this row counts")
+    predicted_disease = models.CharField(max_length=200)
+    risk_level = models.CharField(max_length=20, choices=DiseasePrediction.RISK_LEVEL_CHOICES)
+    gender = models.CharField(max_length=10)
+    age_band = models.CharField(max_length=10)
+    registered_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} - {self.predicted_disease}: {self.count}"
+    
+    class Meta:
+        ordering = ['period', 'bucket']
+        verbose_name = 'Prediction Rollup'
+        verbose_name_plural = 'Prediction Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'predicted_disease', 'risk_level', 'gender', 'age_band', 'registered_by'],
+                name='unique_prediction_rollup_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket'], name='rollup_period_bucket_idx'),
+        ]
+
+
+class ChangeLogEntry(models.Model):
+    """Append-only change sequence for offline sync; deletions are kept as tombstones"""
+    RECORD_TYPE_CHOICES = [
+        ('symptom', 'Symptom Record'),
+        ('prediction', 'Disease Prediction'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    seq = models.BigAutoField(primary_key=True)
+    # Plain ids rather than foreign keys so tombstones outlive the rows they describe
+    patient_id = models.BigIntegerField()
+    record_type = models.CharField(max_length=20, choices=RECORD_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"#{self.seq} {self.record_type} {self.object_id} {self.action}"
+    
+    class Meta:
+        ordering = ['seq']
+        verbose_name = 'Change Log Entry'
+        verbose_name_plural = 'Change Log Entries'
+        indexes = [
+            models.Index(fields=['patient_id', 'seq'], name='changelog_patient_seq_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """One indexed text field of a clinical record"""
+    DOC_TYPE_CHOICES = [
+        ('symptom_note', 'Symptom Notes'),
+        ('medical_history', 'Medical History'),
+        ('prediction', 'AI Explanation'),
+    ]
+    
+    doc_type = models.CharField(max_length=20, choices=DOC_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    patient_id = models.BigIntegerField(db_index=True)
+    length = models.PositiveIntegerField(help_text="Number of indexed terms")
+    
+    def __str__(self):
+        return f"{self.doc_type} #{self.object_id}"
+    
+    class Meta:
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'object_id'], name='unique_search_document'),
+        ]
+
+
+class SearchPosting(models.Model):
+    """Inverted index entry: where a term occurs in a document"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    patient_id = models.BigIntegerField(help_text="Copied from the document so patient searches skip the join")
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField()
+    impact = models.FloatField(help_text="BM25 term weight without idf, at indexing time")
+    positions = models.JSONField()
+    
+    def __str__(self):
+        return f"{self.term} -> {self.document}"
+    
+    class Meta:
+        verbose_name = 'Search Posting'
+        verbose_name_plural = 'Search Postings'
+        indexes = [
+            models.Index(fields=['term', 'document'], name='posting_term_doc_idx'),
+            models.Index(fields=['term', '-impact'], name='posting_term_impact_idx'),
+            models.Index(fields=['patient_id', 'term'], name='posting_patient_term_idx'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Number of indexed documents containing each term (BM25 document frequency)"""
+    term = models.CharField(max_length=64, unique=True)
+    document_count = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.term} ({self.document_count})"
+    
+    class Meta:
+        verbose_name = 'Search Term'
+        verbose_name_plural = 'Search Terms'
+
+
+class SearchStats(models.Model):
+    """Single-row corpus totals for BM25, kept current as documents are (re)indexed"""
+    document_count = models.BigIntegerField(default=0)
+    total_length = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Search Stats'
+        verbose_name_plural = 'Search Stats'
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+
+# Bump whenever the PDF layout changes so cached files are not reused
+REPORT_VERSION = 1
+
+
+class ReportUnavailable(Exception):
+    pass
+
+
+def report_payload(prediction):
+    """Everything the PDF shows, as plain data - also the input to the content hash"""
+    patient = prediction.patient
+    try:
+        explanation = json.loads(prediction.ai_response).get('explanation', '')
+    except (ValueError, AttributeError):
+        explanation = ''
+    return {
+        'version': REPORT_VERSION,
+        'prediction_id': prediction.id,
+        'patient_name': patient.get_full_name() or patient.username,
+        'patient_age': patient.age,
+        'patient_gender': patient.gender,
+        'predicted_disease': prediction.predicted_disease,
+        'confidence_score': prediction.confidence_score,
+        'risk_level': prediction.get_risk_level_display(),
+        'prediction_date': timezone.localtime(prediction.prediction_date).strftime('%B %d, %Y at %I:%M %p'),
+        'explanation': explanation,
+        'symptoms': [
+            {'name': s.get('name', ''), 'severity': s.get('severity', ''), 'duration': s.get('duration', '')}
+            for s in prediction.symptoms_analyzed or []
+        ],
+        'tests': prediction.further_diagnostics.splitlines(),
+        'recommendations': prediction.recommendations.splitlines(),
+        'specialist_referral': prediction.specialist_referral,
+    }
+
+
+def report_key(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def report_path(key):
+    return Path(settings.REPORTS_DIR) / key[:2] / f'{key}.pdf'
+
+
+def render_pdf(payload):
+    """Render a prediction report to PDF bytes"""
+    try:
+        from io import BytesIO
+        from xml.sax.saxutils import escape
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import mm
+        from reportlab.platypus import ListFlowable, Paragraph, SimpleDocTemplate, Spacer
+    except ImportError:
+        raise ReportUnavailable("Install: pip install reportlab")
+
+    styles = getSampleStyleSheet()
+    story = []
+
+    def heading(text):
+        story.append(Spacer(1, 4 * mm))
+        story.append(Paragraph(escape(text), styles['Heading3']))
+
+    def bullets(items):
+        items = [item for item in items if item.strip()]
+        if items:
+            story.append(ListFlowable([Paragraph(escape(item), styles['BodyText']) for item in items],
+                                      bulletType='bullet'))
+        else:
+            story.append(Paragraph('None', styles['BodyText']))
+
+    story.append(Paragraph('MedAid - AI Disease Prediction Report', styles['Title']))
+    story.append(Paragraph(
+        escape(f"Patient: {payload['patient_name']}  |  Age: {payload['patient_age'] or '-'}  |  "
+               f"Gender: {str(payload['patient_gender']).title()}"),
+        styles['BodyText'],
+    ))
+    story.append(Paragraph(escape(f"Generated on {payload['prediction_date']}"), styles['BodyText']))
+
+    heading('Predicted Condition')
+    story.append(Paragraph(escape(payload['predicted_disease']), styles['Heading2']))
+    story.append(Paragraph(
+        escape(f"Confidence: {payload['confidence_score']}%  |  Risk: {payload['risk_level']}"),
+        styles['BodyText'],
+    ))
+    if payload['explanation']:
+        story.append(Paragraph(escape(payload['explanation']), styles['BodyText']))
+
+    heading('Symptoms Analyzed')
+    bullets([f"{s['name']} - {s['severity']}, {s['duration']} days" for s in payload['symptoms']])
+    heading('Recommended Tests')
+    bullets(payload['tests'])
+    heading('Lifestyle Recommendations')
+    bullets(payload['recommendations'])
+    if payload['specialist_referral']:
+        heading('Specialist Referral')
+        story.append(Paragraph(escape(payload['specialist_referral']), styles['BodyText']))
+
+    story.append(Spacer(1, 8 * mm))
+    story.append(Paragraph(
+        'Medical Disclaimer: This is an AI-generated prediction and should not replace professional medical '
+        'advice. Please consult with a qualified healthcare provider for proper diagnosis and treatment.',
+        styles['Italic'],
+    ))
+
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title=f"Prediction #{payload['prediction_id']}").build(story)
+    return buffer.getvalue()
+
+
+def render_to_file(payload, path):
+    """Render into a temp file next to `path` and move it into place atomically"""
+    path = Path(path)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = render_pdf(payload)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+_executor = None
+_in_flight = {}
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.REPORT_WORKERS, thread_name_prefix='report')
+    return _executor
+
+
+def get_report(prediction, timeout=60):
+    """Return (path, key) of the prediction's PDF, rendering it in the worker pool on a cache miss.
+
+    Concurrent requests for the same report share one render.
+    """
+    payload = report_payload(prediction)
+    key = report_key(payload)
+    path = report_path(key)
+    if path.exists():
+        return path, key
+
+    with _lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = _get_executor().submit(render_to_file, payload, path)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return future.result(timeout=timeout), key
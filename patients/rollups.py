@@ -0,0 +1,112 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from .models import AGE_BANDS, DiseasePrediction, PatientProfile, PredictionRollup, age_band
+
+PERIOD_TRUNCATORS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+}
+
+
+def bucket_start(moment, period):
+    """Truncate a datetime to the start of its hour/day in the local timezone"""
+    moment = timezone.localtime(moment)
+    if period == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(using, key, delta):
+    rollups = PredictionRollup.objects.using(using)
+    pk = rollups.filter(**key).values_list('pk', flat=True).first()
+    if pk is None:
+        try:
+            with transaction.atomic(using=using):
+                rollups.create(count=delta, **key)
+            return
+        except IntegrityError:
+            # Another worker created the bucket first - fall through and add to it
+            pk = rollups.filter(**key).values_list('pk', flat=True).first()
+    rollups.filter(pk=pk).update(count=F('count') + delta)
+
+
+def record_prediction(prediction, using='default'):
+    """Add a newly created prediction to its hourly and daily rollup rows"""
+    patient = prediction.patient
+    registered_by_id = (
+        PatientProfile.objects.using(using)
+        .filter(user_id=patient.pk)
+        .values_list('registered_by_id', flat=True)
+        .first()
+    )
+    dimensions = {
+        'predicted_disease': prediction.predicted_disease.strip(),
+        'risk_level': prediction.risk_level,
+        'gender': patient.gender,
+        'age_band': age_band(patient.age),
+        'registered_by_id': registered_by_id,
+    }
+    for period in PERIOD_TRUNCATORS:
+        _bump(using, {
+            'period': period,
+            'bucket': bucket_start(prediction.prediction_date, period),
+            **dimensions,
+        }, 1)
+
+
+def _age_band_expression():
+    whens = []
+    for low, high, label in AGE_BANDS:
+        condition = Q(patient__age__gte=low)
+        if high is not None:
+            condition &= Q(patient__age__lte=high)
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, default=Value('unknown'), output_field=CharField())
+
+
+def rebuild_rollups(using='default', batch_size=1000):
+    """Recompute every rollup row from DiseasePrediction with one GROUP BY per period"""
+    rows = []
+    for period, truncate in PERIOD_TRUNCATORS.items():
+        groups = (
+            DiseasePrediction.objects.using(using)
+            .order_by()
+            .annotate(
+                rollup_bucket=truncate('prediction_date', tzinfo=timezone.get_current_timezone()),
+                rollup_gender=F('patient__gender'),
+                rollup_age_band=_age_band_expression(),
+                rollup_registered_by=F('patient__patientprofile__registered_by'),
+            )
+            .values('rollup_bucket', 'predicted_disease', 'risk_level', 'rollup_gender',
+                    'rollup_age_band', 'rollup_registered_by')
+            .annotate(total=Count('id'))
+        )
+        merged = {}
+        for group in groups.iterator():
+            key = (
+                group['rollup_bucket'],
+                group['predicted_disease'].strip(),
+                group['risk_level'],
+                group['rollup_gender'],
+                group['rollup_age_band'],
+                group['rollup_registered_by'],
+            )
+            merged[key] = merged.get(key, 0) + group['total']
+        for (bucket, disease, risk, gender, band, registered_by_id), total in merged.items():
+            rows.append(PredictionRollup(
+                period=period,
+                bucket=bucket,
+                predicted_disease=disease,
+                risk_level=risk,
+                gender=gender,
+                age_band=band,
+                registered_by_id=registered_by_id,
+                count=total,
+            ))
+
+    with transaction.atomic(using=using):
+        PredictionRollup.objects.using(using).all().delete()
+        PredictionRollup.objects.using(using).bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,340 @@
+import json
+import math
+import re
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+from .models import (
+    DiseasePrediction, PatientProfile, SearchDocument, SearchPosting, SearchStats, SearchTerm, SymptomRecord,
+)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+PHRASE_RE = re.compile(r'"([^"]+)"')
+MAX_TERM_LENGTH = 64
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'to', 'was', 'were', 'with',
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Admin searches score the documents among each term's highest-impact postings
+MAX_CANDIDATES = 1000
+MAX_CANDIDATE_DEPTH = 64000
+
+# The AI response keys worth searching; the rest are structural
+PREDICTION_TEXT_KEYS = [
+    'primary_diagnosis', 'explanation', 'recommended_tests', 'lifestyle_recommendations',
+    'specialist_referral', 'when_to_seek_care',
+]
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def prediction_text(prediction):
+    try:
+        data = json.loads(prediction.ai_response)
+    except (ValueError, TypeError):
+        return f"{prediction.predicted_disease}\n{prediction.ai_response}"
+    if not isinstance(data, dict):
+        return prediction.predicted_disease
+    parts = [prediction.predicted_disease]
+    for key in PREDICTION_TEXT_KEYS:
+        value = data.get(key)
+        if isinstance(value, list):
+            parts.extend(str(item) for item in value)
+        elif value:
+            parts.append(str(value))
+    return '\n'.join(parts)
+
+
+# doc_type -> (model, patient id getter, text getter)
+SOURCES = {
+    'symptom_note': (SymptomRecord, lambda r: r.patient_id, lambda r: r.notes),
+    'medical_history': (PatientProfile, lambda r: r.user_id, lambda r: r.medical_history),
+    'prediction': (DiseasePrediction, lambda r: r.patient_id, prediction_text),
+}
+DOC_TYPE_FOR_MODEL = {model: doc_type for doc_type, (model, _, _) in SOURCES.items()}
+
+
+def _bump_stats(using, documents, length):
+    if not (documents or length):
+        return
+    updated = SearchStats.objects.using(using).filter(pk=1).update(
+        document_count=F('document_count') + documents,
+        total_length=F('total_length') + length,
+    )
+    if not updated:
+        SearchStats.objects.using(using).create(pk=1, document_count=documents, total_length=length)
+
+
+def _bump_terms(using, deltas):
+    """Apply {term: change in document count} to SearchTerm"""
+    deltas = {term: delta for term, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    existing = set(SearchTerm.objects.using(using).filter(term__in=deltas).values_list('term', flat=True))
+    SearchTerm.objects.using(using).bulk_create(
+        [SearchTerm(term=term, document_count=delta) for term, delta in deltas.items() if term not in existing]
+    )
+    for term in existing:
+        SearchTerm.objects.using(using).filter(term=term).update(document_count=F('document_count') + deltas[term])
+
+
+def _average_length(using):
+    stats = SearchStats.objects.using(using).filter(pk=1).first()
+    return stats.total_length / stats.document_count if stats and stats.document_count else None
+
+
+def impact(frequency, length, average_length):
+    """BM25 weight of a term in one document, without idf"""
+    return frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+
+
+def _build(doc_type, record):
+    """Unsaved SearchDocument plus {term: positions} for one record, or (None, {}) if it has no text"""
+    _, patient_of, text_of = SOURCES[doc_type]
+    tokens = tokenize(text_of(record) or '')
+    if not tokens:
+        return None, {}
+    positions = {}
+    for position, token in enumerate(tokens):
+        positions.setdefault(token, []).append(position)
+    document = SearchDocument(doc_type=doc_type, object_id=record.pk, patient_id=patient_of(record), length=len(tokens))
+    return document, positions
+
+
+def remove_document(doc_type, object_id, using='default'):
+    with transaction.atomic(using=using):
+        existing = SearchDocument.objects.using(using).filter(doc_type=doc_type, object_id=object_id).first()
+        if existing is not None:
+            terms = list(existing.postings.values_list('term', flat=True))
+            existing.delete()
+            _bump_stats(using, -1, -existing.length)
+            _bump_terms(using, {term: -1 for term in terms})
+
+
+def index_records(doc_type, records, using='default', count_terms=True):
+    """(Re)index records of one type; replaces any previous postings for them"""
+    records = list(records)
+    if not records:
+        return
+    with transaction.atomic(using=using):
+        documents = SearchDocument.objects.using(using).filter(doc_type=doc_type, object_id__in=[r.pk for r in records])
+        old = list(documents.values_list('length', flat=True))
+        deltas = Counter()
+        if count_terms:
+            for term in SearchPosting.objects.using(using).filter(document__in=documents).values_list('term', flat=True):
+                deltas[term] -= 1
+        documents.delete()
+
+        built = [(document, positions) for document, positions in (_build(doc_type, r) for r in records)
+                 if document is not None]
+        new_documents = [document for document, _ in built]
+        SearchDocument.objects.using(using).bulk_create(new_documents)
+        average_length = _average_length(using) or (
+            sum(d.length for d in new_documents) / len(new_documents) if new_documents else 1)
+        # Postings are built only once their documents are saved in `using`, so the
+        # router never sees a relation between two different shards
+        SearchPosting.objects.using(using).bulk_create(
+            [SearchPosting(document=document, patient_id=document.patient_id, term=term, frequency=len(where),
+                           impact=impact(len(where), document.length, average_length), positions=where)
+             for document, positions in built
+             for term, where in positions.items()],
+            batch_size=1000,
+        )
+        _bump_stats(using, len(new_documents) - len(old), sum(d.length for d in new_documents) - sum(old))
+        if count_terms:
+            for _, positions in built:
+                deltas.update(positions.keys())
+            _bump_terms(using, deltas)
+
+
+def index_record(record, using='default'):
+    index_records(DOC_TYPE_FOR_MODEL[type(record)], [record], using=using)
+
+
+def refresh_statistics(using='default'):
+    """Recompute every impact against the current average length and recount SearchTerm.
+
+    Incremental indexing scores new postings with the average length of the
+    moment; this brings the whole index back in line, e.g. after a rebuild.
+    """
+    average_length = _average_length(using) or 1
+    document = SearchDocument.objects.using(using).filter(pk=OuterRef('document_id'))
+    tf = Cast('frequency', FloatField())
+    length = Cast(Subquery(document.values('length')[:1]), FloatField())
+    with transaction.atomic(using=using):
+        SearchPosting.objects.using(using).update(
+            impact=tf * (K1 + 1) / (tf + K1 * (1 - B) + K1 * B * length / average_length)
+        )
+        SearchTerm.objects.using(using).all().delete()
+        SearchTerm.objects.using(using).bulk_create(
+            [SearchTerm(term=term, document_count=count) for term, count in
+             SearchPosting.objects.using(using).values('term').annotate(n=Count('id')).values_list('term', 'n')],
+            batch_size=1000,
+        )
+
+
+def rebuild_index(using='default', batch_size=1000):
+    """Drop and rebuild the whole index from the source tables"""
+    with transaction.atomic(using=using):
+        SearchPosting.objects.using(using).all().delete()
+        SearchDocument.objects.using(using).all().delete()
+        SearchStats.objects.using(using).all().delete()
+        SearchTerm.objects.using(using).all().delete()
+    total = 0
+    for doc_type, (model, _, _) in SOURCES.items():
+        queryset = model.objects.using(using).order_by('pk')
+        if doc_type == 'symptom_note':
+            queryset = queryset.exclude(notes='')
+        elif doc_type == 'medical_history':
+            queryset = queryset.exclude(medical_history='')
+        batch = []
+        for record in queryset.iterator(chunk_size=batch_size):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                index_records(doc_type, batch, using=using, count_terms=False)
+                total += len(batch)
+                batch = []
+        index_records(doc_type, batch, using=using, count_terms=False)
+        total += len(batch)
+    refresh_statistics(using)
+    return total
+
+
+def parse_query(query):
+    """Split a query into quoted phrases (lists of terms) and the set of all required terms"""
+    quoted = [tokenize(phrase) for phrase in PHRASE_RE.findall(query)]
+    terms = set(tokenize(PHRASE_RE.sub(' ', query)))
+    for phrase in quoted:
+        terms.update(phrase)
+    # A one-term phrase is just a required term; only longer ones need a positional check
+    phrases = [phrase for phrase in quoted if len(phrase) > 1]
+    return terms, phrases
+
+
+def _contains_phrase(positions, phrase):
+    starts = set(positions[phrase[0]])
+    for offset, term in enumerate(phrase[1:], start=1):
+        starts &= {position - offset for position in positions[term]}
+        if not starts:
+            return False
+    return True
+
+
+def _scored(postings, terms, idf, document_ids=None):
+    """[(document_id, BM25 score)] best first, for documents holding every term"""
+    scores, matched = {}, Counter()
+    postings = postings.filter(term__in=terms)
+    if document_ids is None:
+        chunks = [postings]
+    else:
+        document_ids = sorted(document_ids)
+        chunks = [postings.filter(document_id__in=document_ids[i:i + 10000]) for i in range(0, len(document_ids), 10000)]
+    for chunk in chunks:
+        for document_id, term, weight in chunk.values_list('document_id', 'term', 'impact'):
+            scores[document_id] = scores.get(document_id, 0.0) + idf[term] * weight
+            matched[document_id] += 1
+    return sorted(((document_id, score) for document_id, score in scores.items() if matched[document_id] == len(terms)),
+                  key=lambda item: (-item[1], item[0]))
+
+
+def _top(ranked, phrases, limit, using):
+    """The first `limit` ranked documents that contain every phrase"""
+    if not phrases:
+        return [(score, document_id) for document_id, score in ranked[:limit]]
+    # Only the best-scoring candidates get their positions loaded, a growing batch at a time
+    phrase_terms = {term for phrase in phrases for term in phrase}
+    top, offset, batch = [], 0, max(limit * 4, 100)
+    while len(top) < limit and offset < len(ranked):
+        rows = ranked[offset:offset + batch]
+        positions = {}
+        for document_id, term, where in SearchPosting.objects.using(using).filter(
+                document_id__in=[document_id for document_id, _ in rows], term__in=phrase_terms
+        ).values_list('document_id', 'term', 'positions'):
+            positions.setdefault(document_id, {})[term] = where
+        top.extend((score, document_id) for document_id, score in rows
+                   if all(_contains_phrase(positions[document_id], phrase) for phrase in phrases))
+        offset += batch
+        batch *= 2
+    return top[:limit]
+
+
+def search(query, user, doc_types=None, limit=20, using=None):
+    """Ranked (BM25) search; every term must match and quoted phrases must appear verbatim.
+
+    Patients only ever see their own records, read straight from the
+    (patient_id, term) index. Admins search the whole shard, so only the
+    documents among each term's highest-impact postings are scored: first
+    MAX_CANDIDATES per term, deepening while there are too few hits, up to
+    MAX_CANDIDATE_DEPTH. Terms in fewer documents than that are read in full.
+    """
+    terms, phrases = parse_query(query)
+    if not terms:
+        return []
+
+    document_frequency = dict(
+        SearchTerm.objects.using(using).filter(term__in=terms, document_count__gt=0)
+        .values_list('term', 'document_count')
+    )
+    if len(document_frequency) < len(terms):
+        return []
+    stats = SearchStats.objects.using(using).filter(pk=1).first()
+    total_docs = max(stats.document_count if stats else 1, 1)
+    idf = {term: math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    postings = SearchPosting.objects.using(using)
+    if doc_types:
+        postings = postings.filter(document__doc_type__in=doc_types)
+    if user.user_type != 'admin':
+        top = _top(_scored(postings.filter(patient_id=user.id), terms, idf), phrases, limit, using)
+    else:
+        depth = MAX_CANDIDATES
+        while True:
+            candidates = set()
+            for term in terms:
+                candidates.update(
+                    postings.filter(term=term).order_by('-impact').values_list('document_id', flat=True)[:depth]
+                )
+            top = _top(_scored(postings, terms, idf, candidates), phrases, limit, using)
+            if len(top) >= limit or depth >= max(document_frequency.values()) or depth >= MAX_CANDIDATE_DEPTH:
+                break
+            depth *= 4
+
+    documents = SearchDocument.objects.using(using).in_bulk([document_id for _, document_id in top])
+    return [{'document': documents[document_id], 'score': score} for score, document_id in top]
+
+
+def attach_sources(results, terms, using=None, snippet_length=160):
+    """Load each hit's source record and a snippet around the first matching term"""
+    by_type = {}
+    for result in results:
+        by_type.setdefault(result['document'].doc_type, []).append(result['document'].object_id)
+    sources = {}
+    for doc_type, ids in by_type.items():
+        model, _, _ = SOURCES[doc_type]
+        queryset = model.objects.using(using)
+        queryset = queryset.select_related('user' if model is PatientProfile else 'patient')
+        sources[doc_type] = queryset.in_bulk(ids)
+
+    for result in results:
+        document = result['document']
+        record = sources[document.doc_type].get(document.object_id)
+        result['record'] = record
+        if record is None:
+            result['snippet'] = ''
+            continue
+        result['patient'] = record.user if isinstance(record, PatientProfile) else record.patient
+        text = ' '.join((SOURCES[document.doc_type][2](record) or '').split())
+        lowered = text.lower()
+        hit = min((i for i in (lowered.find(term) for term in terms) if i >= 0), default=0)
+        start = max(0, hit - snippet_length // 3)
+        snippet = text[start:start + snippet_length]
+        result['snippet'] = ('…' if start else '') + snippet + ('…' if start + snippet_length < len(text) else '')
+    return results
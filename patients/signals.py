@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+from .models import CanonicalSymptom, PatientProfile, SymptomRecord, DiseasePrediction, ChangeLogEntry
+from .rollups import record_prediction
+from .search import DOC_TYPE_FOR_MODEL, index_record, index_records, remove_document
+from .similarity import get_similarity_index
+from .vocabulary import get_vocabulary, reset_vocabulary
+
+# bulk_create() skips post_save, so bulk symptom inserts announce themselves
+# with this signal instead. Sent with patient, records and using.
+symptoms_bulk_created = Signal()
+
+
+@receiver(pre_save, sender=SymptomRecord)
+def map_canonical_symptom(sender, instance, using, raw=False, **kwargs):
+    """Link free-text symptom names to the canonical vocabulary on save"""
+    if not raw:
+        instance.canonical_symptom_id = get_vocabulary(using).resolve(instance.symptom_name)
+
+
+@receiver(post_save, sender=CanonicalSymptom)
+@receiver(post_delete, sender=CanonicalSymptom)
+def invalidate_vocabulary(sender, using, **kwargs):
+    reset_vocabulary(using)
+
+
+@receiver(post_save, sender=SymptomRecord)
+@receiver(post_delete, sender=SymptomRecord)
+def refresh_similarity_index(sender, instance, using, **kwargs):
+    """Keep the patient similarity index in step with symptom changes"""
+    get_similarity_index(using).refresh_patient(instance.patient_id)
+
+
+@receiver(symptoms_bulk_created)
+def refresh_similarity_index_bulk(sender, patient, using='default', **kwargs):
+    get_similarity_index(using).refresh_patient(patient.id)
+
+
+@receiver(post_save, sender=DiseasePrediction)
+def update_prediction_rollups(sender, instance, created, using, raw=False, **kwargs):
+    """Count each new prediction into the analytics rollups once it is committed"""
+    if created and not raw:
+        transaction.on_commit(lambda: record_prediction(instance, using=using), using=using)
+
+
+CHANGE_RECORD_TYPES = {
+    SymptomRecord: 'symptom',
+    DiseasePrediction: 'prediction',
+}
+
+
+@receiver(post_save, sender=SymptomRecord)
+@receiver(post_save, sender=DiseasePrediction)
+def log_saved_record(sender, instance, created, using, raw=False, **kwargs):
+    """Append a change-feed entry for every created/updated record"""
+    if raw:
+        return
+    ChangeLogEntry.objects.using(using).create(
+        patient_id=instance.patient_id,
+        record_type=CHANGE_RECORD_TYPES[sender],
+        object_id=instance.pk,
+        action='created' if created else 'updated',
+    )
+
+
+@receiver(post_delete, sender=SymptomRecord)
+@receiver(post_delete, sender=DiseasePrediction)
+def log_deleted_record(sender, instance, using, **kwargs):
+    """Leave a tombstone so syncing clients learn about the deletion"""
+    ChangeLogEntry.objects.using(using).create(
+        patient_id=instance.patient_id,
+        record_type=CHANGE_RECORD_TYPES[sender],
+        object_id=instance.pk,
+        action='deleted',
+    )
+
+
+@receiver(symptoms_bulk_created)
+def log_bulk_symptoms(sender, patient, records, using='default', **kwargs):
+    ChangeLogEntry.objects.using(using).bulk_create([
+        ChangeLogEntry(patient_id=patient.id, record_type='symptom', object_id=record.pk, action='created')
+        for record in records
+    ])
+
+
+@receiver(post_save, sender=SymptomRecord)
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_save, sender=DiseasePrediction)
+def update_search_index(sender, instance, using, raw=False, **kwargs):
+    """Re-index the record's searchable text (notes, medical history, AI explanation)"""
+    if not raw:
+        index_record(instance, using=using)
+
+
+@receiver(post_delete, sender=SymptomRecord)
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_delete, sender=DiseasePrediction)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    remove_document(DOC_TYPE_FOR_MODEL[sender], instance.pk, using=using)
+
+
+@receiver(symptoms_bulk_created)
+def index_bulk_symptoms(sender, records, using='default', **kwargs):
+    index_records('symptom_note', [record for record in records if record.notes], using=using)
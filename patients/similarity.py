@@ -0,0 +1,267 @@
+import heapq
+import math
+import threading
+from itertools import combinations
+from .vocabulary import normalize_term
+
+
+def symptom_feature(symptom_name, canonical_id=None):
+    """Vector feature key: the canonical symptom when known, else the normalised free text"""
+    if canonical_id is not None:
+        return f'#{canonical_id}'
+    return normalize_term(symptom_name)
+
+
+def symptom_weight(severity, duration_days):
+    """Weight of one symptom: severity scaled by how long it has persisted"""
+    return severity * (1 + math.log1p(max(duration_days or 0, 0)))
+
+
+# Features shared by at most this many patients are scanned in full. Commoner
+# ones (fever, cough, ...) only reach a query through the pair index below, or
+# through their champion list: the patients with the highest weight / norm.
+CHAMPIONS_PER_FEATURE = 1000
+
+# Each patient is also filed under every pair of its strongest few features
+SIGNATURE_FEATURES = 3
+
+
+def signature_pairs(vector):
+    """Pairs of the vector's strongest features, each pair sorted"""
+    strongest = sorted(vector, key=lambda feature: (-vector[feature], feature))[:SIGNATURE_FEATURES]
+    return list(combinations(sorted(strongest), 2))
+
+
+class SymptomSimilarityIndex:
+    """In-memory sparse index of patient symptom vectors.
+
+    Each patient is a sparse vector of {feature: weight}. Vectors are kept in
+    an inverted index (feature -> {patient_id: weight}) and in a pair index
+    (pair of strongest features -> patient ids). A query's candidates are the
+    patients sharing a rare feature with it or filed under one of its own
+    strongest pairs; a single-feature query uses that feature's champion list,
+    which is exact for it. Candidates are then scored exactly against their
+    full vectors, so no query scans the posting list of a common symptom.
+
+    Every process holds its own index, so signals only keep it current for
+    writes made in the same process. Before answering a query, an index
+    loaded from the database also replays the symptom rows of ChangeLogEntry
+    newer than the last sequence number it has applied, which covers other
+    workers and bulk copies such as migrate_shards.
+    """
+
+    def __init__(self, using='default', champions=CHAMPIONS_PER_FEATURE):
+        self.using = using
+        self.champions = champions
+        self._lock = threading.RLock()
+        self._vectors = {}
+        self._norms = {}
+        self._postings = {}
+        self._pairs = {}
+        # feature -> (candidate patient ids, lowest normalised weight among them or None if complete)
+        self._champion_lists = {}
+        self._loaded = False
+        self._loader = None
+        self._pending = set()
+        # Highest ChangeLogEntry.seq reflected in the index; None when not loaded from the database
+        self._applied_seq = None
+        self._catch_up_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """True once the index is ready; otherwise starts loading it in the background"""
+        if self._loaded:
+            return True
+        with self._lock:
+            if self._loader is None:
+                self._loader = threading.Thread(target=self._load, name=f'similarity-{self.using}', daemon=True)
+                self._loader.start()
+        return self._loaded
+
+    def _load(self):
+        from django.db import connections
+        from .models import ChangeLogEntry, SymptomRecord
+
+        try:
+            # Read before the symptoms, so anything logged during the load is replayed afterwards
+            seq = ChangeLogEntry.objects.using(self.using).order_by('-seq').values_list('seq', flat=True).first() or 0
+            vectors = {}
+            rows = SymptomRecord.objects.using(self.using).values_list(
+                'patient_id', 'symptom_name', 'canonical_symptom_id', 'severity', 'duration_days'
+            ).iterator(chunk_size=5000)
+            for patient_id, name, canonical_id, severity, duration in rows:
+                vector = vectors.setdefault(patient_id, {})
+                feature = symptom_feature(name, canonical_id)
+                vector[feature] = max(vector.get(feature, 0), symptom_weight(severity, duration))
+            pending = self.load(vectors, seq=seq)
+            # Patients changed while the table was being read
+            for patient_id in pending:
+                self.refresh_patient(patient_id)
+        except Exception as e:
+            print(f"[Similarity] Loading index for {self.using} failed: {e}")
+            with self._lock:
+                self._loader = None
+        finally:
+            connections[self.using].close()
+
+    def load(self, vectors, seq=None):
+        """Replace the whole index with {patient_id: vector}; returns ids refreshed meanwhile.
+
+        `seq` is the change log position the vectors were read at; without it
+        the index never catches up from the change log.
+        """
+        fresh = SymptomSimilarityIndex(self.using, self.champions)
+        for patient_id, vector in vectors.items():
+            fresh._set_vector(patient_id, vector)
+        with self._lock:
+            self._vectors, self._norms, self._postings = fresh._vectors, fresh._norms, fresh._postings
+            self._pairs = fresh._pairs
+            self._champion_lists = {}
+            self._loaded = True
+            self._applied_seq = seq
+            pending, self._pending = self._pending, set()
+        return pending
+
+    def _set_vector(self, patient_id, vector):
+        old_vector = self._vectors.get(patient_id, {})
+        old_norm = self._norms.get(patient_id)
+        for feature, weight in old_vector.items():
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.pop(patient_id, None)
+                if not postings:
+                    del self._postings[feature]
+            self._touch(feature, weight / old_norm)
+        for pair in signature_pairs(old_vector):
+            members = self._pairs.get(pair)
+            if members is not None:
+                members.discard(patient_id)
+                if not members:
+                    del self._pairs[pair]
+
+        if not vector:
+            self._vectors.pop(patient_id, None)
+            self._norms.pop(patient_id, None)
+            return
+
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        self._vectors[patient_id] = vector
+        self._norms[patient_id] = norm
+        for feature, weight in vector.items():
+            self._postings.setdefault(feature, {})[patient_id] = weight
+            self._touch(feature, weight / norm)
+        for pair in signature_pairs(vector):
+            self._pairs.setdefault(pair, set()).add(patient_id)
+
+    def _touch(self, feature, normalized_weight):
+        """Drop a feature's champion list if a change could alter it; rebuilt on next query"""
+        cached = self._champion_lists.get(feature)
+        if cached is not None and (cached[1] is None or normalized_weight >= cached[1]):
+            del self._champion_lists[feature]
+
+    def _champion_list(self, feature):
+        cached = self._champion_lists.get(feature)
+        if cached is None:
+            postings = self._postings.get(feature, {})
+            if len(postings) <= self.champions:
+                cached = (list(postings), None)
+            else:
+                norms = self._norms
+                top = heapq.nlargest(self.champions, ((w / norms[pid], pid) for pid, w in postings.items()))
+                cached = ([pid for _, pid in top], top[-1][0])
+            self._champion_lists[feature] = cached
+        return cached[0]
+
+    def refresh_patient(self, patient_id):
+        """Rebuild one patient's vector from the database after a symptom change"""
+        with self._lock:
+            if not self._loaded:
+                if self._loader is not None:
+                    self._pending.add(patient_id)
+                # Otherwise the full load on first query will pick the change up.
+                return
+        from .models import SymptomRecord
+
+        vector = {}
+        rows = SymptomRecord.objects.using(self.using).filter(patient_id=patient_id).values_list(
+            'symptom_name', 'canonical_symptom_id', 'severity', 'duration_days'
+        )
+        for name, canonical_id, severity, duration in rows:
+            feature = symptom_feature(name, canonical_id)
+            vector[feature] = max(vector.get(feature, 0), symptom_weight(severity, duration))
+
+        with self._lock:
+            self._set_vector(patient_id, vector)
+
+    def catch_up(self):
+        """Refresh the patients whose symptoms changed in the change log since the last call"""
+        if self._applied_seq is None or not self._catch_up_lock.acquire(blocking=False):
+            # Another thread is already catching up; its results are good enough for this query
+            return
+        try:
+            from .models import ChangeLogEntry
+
+            changes = list(ChangeLogEntry.objects.using(self.using).filter(seq__gt=self._applied_seq)
+                           .values_list('seq', 'patient_id', 'record_type'))
+            for patient_id in {patient_id for _, patient_id, record_type in changes if record_type == 'symptom'}:
+                self.refresh_patient(patient_id)
+            if changes:
+                self._applied_seq = changes[-1][0]
+        finally:
+            self._catch_up_lock.release()
+
+    def remove_patient(self, patient_id):
+        with self._lock:
+            self._set_vector(patient_id, {})
+
+    def similar_patients(self, patient_id, k=5):
+        """Return [(patient_id, cosine_similarity), ...] for the top-k matches.
+
+        Returns [] while the index is still loading.
+        """
+        if not self._ensure_loaded():
+            return []
+        self.catch_up()
+        with self._lock:
+            query = self._vectors.get(patient_id)
+            if not query:
+                return []
+            query_norm = self._norms[patient_id]
+            candidates = set()
+            for pair in signature_pairs(query):
+                candidates.update(self._pairs.get(pair, ()))
+            for feature in query:
+                postings = self._postings.get(feature, {})
+                if len(postings) <= self.champions:
+                    candidates.update(postings)
+            if len(candidates) <= k:
+                for feature in query:
+                    candidates.update(self._champion_list(feature))
+            vectors, norms = self._vectors, self._norms
+        candidates.discard(patient_id)
+
+        # Scored outside the lock: vectors are replaced, never mutated, so reads stay consistent
+        items = list(query.items())
+        scored = []
+        for other_id in candidates:
+            vector = vectors.get(other_id)
+            norm = norms.get(other_id)
+            if vector and norm:
+                dot = sum([weight * vector[feature] for feature, weight in items if feature in vector])
+                scored.append((other_id, dot / (query_norm * norm)))
+        return heapq.nlargest(k, scored, key=lambda item: item[1])
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_similarity_index(using=None):
+    """The index for one database; patient ids are only unique within a clinic shard"""
+    from medaid.sharding import current_shard
+
+    using = using or current_shard()
+    index = _indexes.get(using)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(using, SymptomSimilarityIndex(using))
+    return index
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+
+# Deliberately the same work every manage.py command and worker does at boot:
+# configure Django, load every app and import the URLconf (which pulls in all views).
+COLD_START_SCRIPT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+# Modules that must only ever be imported on first use, never at boot
+DEFERRED_MODULES = [
+    'google.generativeai',
+    'reportlab',
+]
+
+
+def measure_cold_start():
+    """Boot Django in a fresh interpreter with -X importtime.
+
+    Returns (wall_seconds, rows) where rows are (module, self_us, cumulative_us)
+    as reported by the interpreter for every import made during startup.
+    """
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'medaid.settings')
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START_SCRIPT],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Cold start failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return wall, rows
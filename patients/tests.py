@@ -1,3 +1,602 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import CustomUser
+from medaid.admission import AdmissionPool, Overloaded
+from medaid.sharding import SESSION_KEY, ClinicShardRouter, using_shard
+from .audit import AuditLog
+from .models import (
+    CanonicalSymptom, ChangeLogEntry, DiseasePrediction, PatientProfile, PredictionRollup, SearchTerm, SymptomRecord,
+)
+from .rollups import rebuild_rollups
+from .search import parse_query, search
+from .similarity import SymptomSimilarityIndex
+from .startup import DEFERRED_MODULES, measure_cold_start
+from .vocabulary import MAX_SUGGESTIONS, SymptomVocabulary, canonicalize, get_vocabulary, reset_vocabulary
 
-# Create your tests here.
+
+class StartupBudgetTests(SimpleTestCase):
+    """Guards the cold-start cost every manage.py command and worker pays"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.wall, cls.rows = measure_cold_start()
+
+    def test_cold_start_within_budget(self):
+        self.assertLessEqual(
+            self.wall, settings.STARTUP_TIME_BUDGET,
+            f"Cold start took {self.wall:.2f}s, budget is {settings.STARTUP_TIME_BUDGET:.2f}s. "
+            "Run `manage.py profile_startup` to find the slow imports.",
+        )
+
+    def test_heavy_modules_are_deferred(self):
+        imported = {module for module, _, _ in self.rows}
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, imported, f"{module} is imported at startup; import it on first use")
+
+
+class AdmissionPoolTests(SimpleTestCase):
+    """Saturated pools must shed load quickly instead of queueing without bound"""
+
+    def test_rejects_when_queue_full(self):
+        pool = AdmissionPool('test', concurrency=1, queue=0, timeout=5.0)
+        pool.acquire()
+        with self.assertRaises(Overloaded):
+            pool.acquire()
+        pool.release()
+        self.assertEqual(pool.snapshot()['rejected_queue_full'], 1)
+
+    def test_queued_request_times_out(self):
+        pool = AdmissionPool('test', concurrency=1, queue=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(Overloaded):
+            pool.acquire()
+        pool.release()
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot['rejected_timeout'], snapshot['waiting']), (1, 0))
+
+    def test_queued_request_admitted_when_slot_frees(self):
+        pool = AdmissionPool('test', concurrency=1, queue=1, timeout=5.0)
+        pool.acquire()
+        waiter = threading.Thread(target=lambda: (pool.acquire(), pool.release()))
+        waiter.start()
+        pool.release()
+        waiter.join(5)
+        snapshot = pool.snapshot()
+        self.assertEqual((snapshot['admitted'], snapshot['active']), (2, 0))
+
+
+class AuditLogTests(SimpleTestCase):
+    """Buffered audit events reach JSON-lines segments, roll over by size and can be queried back"""
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = Path(temp.name)
+        self.user = CustomUser(id=7, username='clinician')
+
+    def make_log(self, **options):
+        # A long interval keeps the background flusher out of the way; the tests flush by hand
+        return AuditLog(self.directory, flush_size=1000, flush_interval=60, **options)
+
+    def test_flush_writes_buffered_events(self):
+        log = self.make_log()
+        log.record(self.user, 'view', 'symptom', 1, patient_id=3)
+        log.record(self.user, 'update', 'symptom', 1, patient_id=3)
+        log.flush()
+        self.assertEqual([e['action'] for e in log.query()], ['view', 'update'])
+        self.assertEqual(next(log.query(action='update'))['username'], 'clinician')
+        self.assertEqual(len(log.segments()), 1)
+
+    def test_segments_roll_over_at_segment_bytes(self):
+        log = self.make_log(segment_bytes=1)
+        for object_id in range(3):
+            log.record(self.user, 'view', 'symptom', object_id)
+            log.flush()
+        self.assertEqual(len(log.segments()), 3)
+        self.assertEqual([e['object_id'] for e in log.query()], [0, 1, 2])
+
+    def test_query_since_until(self):
+        log = self.make_log()
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        with mock.patch('patients.audit.time.time', side_effect=[start.timestamp() + hour * 3600 for hour in range(4)]):
+            for object_id in range(4):
+                log.record(self.user, 'view', 'symptom', object_id)
+        log.flush()
+        since, until = start + timedelta(hours=1), start + timedelta(hours=3)
+        self.assertEqual([e['object_id'] for e in log.query(since=since, until=until)], [1, 2])
+
+    def test_full_buffer_drops_oldest_events(self):
+        log = self.make_log(max_buffer=3)
+        for object_id in range(5):
+            log.record(self.user, 'view', 'symptom', object_id)
+        self.assertEqual(log.dropped, 2)
+        with mock.patch.object(log, '_current_segment', side_effect=OSError('disk full')):
+            log.record(self.user, 'view', 'symptom', 5)
+            with self.assertRaises(OSError):
+                log.flush()
+        log.flush()
+        self.assertEqual([e['object_id'] for e in log.query()], [3, 4, 5])
+        self.assertEqual(log.dropped, 3)
+
+
+class SymptomSimilarityIndexTests(SimpleTestCase):
+    """The pruned candidate set must still find the obvious matches and follow updates"""
+
+    def setUp(self):
+        self.index = SymptomSimilarityIndex(using='test', champions=2)
+        # Five patients share fever, so its posting list is longer than the champion cap
+        self.index.load({
+            1: {'fever': 3.0, 'cough': 2.0, 'headache': 1.0},
+            2: {'fever': 3.0, 'cough': 2.0, 'headache': 1.0},
+            3: {'fever': 1.0, 'rash': 3.0},
+            4: {'fever': 2.0},
+            5: {'fever': 1.0, 'nausea': 2.0},
+            6: {'rash': 1.0},
+        })
+
+    def test_identical_patient_ranks_first(self):
+        self.assertEqual(self.index.similar_patients(1, k=1), [(2, 1.0)])
+
+    def test_rare_feature_matches_are_candidates(self):
+        self.assertEqual({patient_id for patient_id, _ in self.index.similar_patients(6, k=5)}, {3})
+
+    def test_single_feature_query_uses_champions(self):
+        self.assertIn(self.index.similar_patients(4, k=1)[0][0], {1, 2})
+
+    def test_updates_reach_champion_lists(self):
+        self.index.similar_patients(4, k=1)
+        with self.index._lock:
+            self.index._set_vector(7, {'fever': 5.0})
+        self.assertEqual(self.index.similar_patients(4, k=1), [(7, 1.0)])
+
+    def test_removed_patient_is_not_returned(self):
+        self.index.remove_patient(2)
+        self.assertNotIn(2, [patient_id for patient_id, _ in self.index.similar_patients(1, k=5)])
+
+
+class SimilarityCatchUpTests(TestCase):
+    """Symptom changes written by other processes reach this process's index through the change log"""
+
+    def test_catches_up_on_changes_logged_elsewhere(self):
+        alice, bob, carol = [CustomUser.objects.create_user(name, password='pw') for name in ('alice', 'bob', 'carol')]
+        SymptomRecord.objects.create(patient=alice, symptom_name='Clicking elbow', duration_days=3)
+        SymptomRecord.objects.create(patient=bob, symptom_name='Blue toes', duration_days=3)
+        index = SymptomSimilarityIndex()
+        index._load()
+        self.assertEqual(index.similar_patients(alice.id), [])
+
+        # bulk_create skips the signals, as if another worker or migrate_shards had written the row
+        record, = SymptomRecord.objects.bulk_create(
+            [SymptomRecord(patient=carol, symptom_name='Clicking elbow', duration_days=3)]
+        )
+        ChangeLogEntry.objects.create(patient_id=carol.id, record_type='symptom', object_id=record.pk, action='created')
+        self.assertEqual([patient_id for patient_id, _ in index.similar_patients(alice.id)], [carol.id])
+
+        SymptomRecord.objects.filter(pk=record.pk).delete()
+        self.assertEqual(index.similar_patients(alice.id), [])
+
+
+@mock.patch('patients.api.audit')
+class PatientApiTests(TestCase):
+    """Permissions, keyset pagination and bulk symptom creation in the JSON API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('clinician', password='pw', user_type='admin')
+        cls.patients = [
+            CustomUser.objects.create_user(f'patient{i}', password='pw', user_type='patient')
+            for i in range(5)
+        ]
+        for patient in cls.patients:
+            PatientProfile.objects.create(user=patient, registered_by=cls.admin)
+
+    def test_requires_login(self, audit):
+        response = self.client.get(reverse('api_patient_list'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_patient_list_is_admin_only(self, audit):
+        self.client.force_login(self.patients[0])
+        self.assertEqual(self.client.get(reverse('api_patient_list')).status_code, 403)
+
+    def test_patient_cannot_read_another_patient(self, audit):
+        self.client.force_login(self.patients[0])
+        own = self.client.get(reverse('api_patient_detail', args=[self.patients[0].id]))
+        other = self.client.get(reverse('api_patient_detail', args=[self.patients[1].id]))
+        self.assertEqual(own.status_code, 200)
+        self.assertEqual(other.status_code, 403)
+        other_symptoms = self.client.get(reverse('api_patient_symptoms', args=[self.patients[1].id]))
+        self.assertEqual(other_symptoms.status_code, 403)
+
+    def test_cursor_walks_every_patient_once(self, audit):
+        self.client.force_login(self.admin)
+        seen, cursor = [], None
+        for _ in range(10):
+            params = {'limit': 2, 'fields': 'id,username'}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('api_patient_list'), params).json()
+            self.assertTrue(all(set(row) == {'id', 'username'} for row in data['results']))
+            seen.extend(row['id'] for row in data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted((p.id for p in self.patients), reverse=True))
+
+    def test_invalid_cursor_and_fields_are_rejected(self, audit):
+        self.client.force_login(self.admin)
+        url = reverse('api_patient_list')
+        self.assertEqual(self.client.get(url, {'cursor': '!!'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+
+    def test_bulk_create_symptoms(self, audit):
+        self.client.force_login(self.admin)
+        patient = self.patients[0]
+        payload = {'symptoms': [
+            {'symptom_name': 'Fever', 'severity': 2, 'duration_days': 3},
+            {'symptom_name': 'Cough', 'severity': 1, 'duration_days': 5},
+        ]}
+        response = self.client.post(reverse('api_patient_symptoms', args=[patient.id]),
+                                    json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['symptom_name'] for row in response.json()['results']], ['Fever', 'Cough'])
+        self.assertEqual(SymptomRecord.objects.filter(patient=patient).count(), 2)
+        self.assertEqual(audit.call_count, 2)
+
+    def test_bulk_create_is_all_or_nothing(self, audit):
+        self.client.force_login(self.admin)
+        patient = self.patients[0]
+        payload = [{'symptom_name': 'Fever', 'severity': 2, 'duration_days': 3}, {'symptom_name': 'Cough'}]
+        response = self.client.post(reverse('api_patient_symptoms', args=[patient.id]),
+                                    json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1', response.json()['errors'])
+        self.assertFalse(SymptomRecord.objects.filter(patient=patient).exists())
+
+    def test_patient_cannot_create_symptoms(self, audit):
+        patient = self.patients[0]
+        self.client.force_login(patient)
+        response = self.client.post(reverse('api_patient_symptoms', args=[patient.id]),
+                                    json.dumps({'symptom_name': 'Fever', 'severity': 2, 'duration_days': 3}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(SymptomRecord.objects.exists())
+
+
+@mock.patch('patients.views.audit')
+@mock.patch('patients.views.admit', side_effect=Overloaded('heavy', 'queue full'))
+class PredictionOverloadTests(TestCase):
+    """A busy AI pool must not send an admin back to a form that would save the symptoms twice"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('clinician', password='pw', user_type='admin')
+        cls.patient = CustomUser.objects.create_user('patient', password='pw', user_type='patient')
+        PatientProfile.objects.create(user=cls.patient, registered_by=cls.admin)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def predict_now(self, **headers):
+        data = {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0', 'action': 'predict_now',
+            'form-0-symptom_name': 'Cough', 'form-0-severity': '2', 'form-0-duration_days': '3',
+        }
+        return self.client.post(reverse('add_symptoms', args=[self.patient.id]), data, **headers)
+
+    def test_symptom_form_redirects_to_prediction_page(self, admit, audit):
+        response = self.predict_now()
+        self.assertRedirects(response, reverse('generate_prediction', args=[self.patient.id]),
+                             fetch_redirect_response=False)
+        self.assertEqual(SymptomRecord.objects.filter(patient=self.patient).count(), 1)
+        self.assertIn('busy', ' '.join(str(m) for m in get_messages(response.wsgi_request)))
+
+    def test_json_clients_still_get_503(self, admit, audit):
+        response = self.predict_now(HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    def test_prediction_page_post_still_gets_503(self, admit, audit):
+        SymptomRecord.objects.create(patient=self.patient, symptom_name='Cough', duration_days=3)
+        response = self.client.post(reverse('generate_prediction', args=[self.patient.id]))
+        self.assertEqual(response.status_code, 503)
+
+
+@mock.patch('patients.views.audit')
+class ChangesFeedTests(TestCase):
+    """The changes feed collapses repeated edits and reports deletions as tombstones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('clinician', password='pw', user_type='admin')
+        cls.patient = CustomUser.objects.create_user('patient', password='pw', user_type='patient')
+        cls.other = CustomUser.objects.create_user('other', password='pw', user_type='patient')
+
+    def changes(self, since=0, **params):
+        response = self.client.get(reverse('api_patient_changes', args=[self.patient.id]), {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_updates_collapse_to_latest_state(self, audit):
+        self.client.force_login(self.patient)
+        symptom = SymptomRecord.objects.create(patient=self.patient, symptom_name='Fever', duration_days=1)
+        symptom.duration_days = 4
+        symptom.save()
+        data = self.changes()
+        self.assertEqual([row['id'] for row in data['symptoms']['upserts']], [symptom.id])
+        self.assertEqual(data['symptoms']['upserts'][0]['duration_days'], 4)
+        self.assertEqual(data['symptoms']['deleted'], [])
+        self.assertEqual(self.changes(since=data['cursor'])['symptoms'], {'upserts': [], 'deleted': []})
+
+    def test_delete_symptom_leaves_tombstone(self, audit):
+        kept = SymptomRecord.objects.create(patient=self.patient, symptom_name='Cough', duration_days=2)
+        doomed = SymptomRecord.objects.create(patient=self.patient, symptom_name='Fever', duration_days=1)
+        self.client.force_login(self.patient)
+        cursor = self.changes()['cursor']
+
+        self.client.force_login(self.admin)
+        self.client.post(reverse('delete_symptom', args=[doomed.id]))
+        self.client.force_login(self.patient)
+
+        # A client that synced before the delete only learns about the tombstone
+        data = self.changes(since=cursor)
+        self.assertEqual(data['symptoms'], {'upserts': [], 'deleted': [doomed.id]})
+        # A fresh client sees the deleted record only as deleted, never as an upsert
+        data = self.changes()
+        self.assertEqual([row['id'] for row in data['symptoms']['upserts']], [kept.id])
+        self.assertEqual(data['symptoms']['deleted'], [doomed.id])
+
+    def test_predictions_are_included(self, audit):
+        self.client.force_login(self.patient)
+        prediction = DiseasePrediction.objects.create(
+            patient=self.patient, predicted_disease='Influenza', confidence_score=70, risk_level='low',
+            symptoms_analyzed=[], recommendations='', further_diagnostics='', ai_response='{}',
+        )
+        data = self.changes()
+        self.assertEqual([row['id'] for row in data['predictions']['upserts']], [prediction.id])
+
+    def test_limit_pages_through_the_log(self, audit):
+        self.client.force_login(self.patient)
+        ids = [SymptomRecord.objects.create(patient=self.patient, symptom_name=f'S{i}', duration_days=1).id
+               for i in range(3)]
+        first = self.changes(limit=2)
+        self.assertTrue(first['has_more'])
+        second = self.changes(since=first['cursor'], limit=2)
+        self.assertFalse(second['has_more'])
+        synced = [row['id'] for page in (first, second) for row in page['symptoms']['upserts']]
+        self.assertEqual(sorted(synced), ids)
+
+    def test_other_patients_feed_is_forbidden(self, audit):
+        self.client.force_login(self.other)
+        response = self.client.get(reverse('api_patient_changes', args=[self.patient.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class PredictionRollupTests(TestCase):
+    """The rollups kept up on every new prediction must match a full rebuild"""
+
+    def rollups(self):
+        return sorted(PredictionRollup.objects.values_list(
+            'period', 'bucket', 'predicted_disease', 'risk_level', 'gender', 'age_band', 'registered_by', 'count',
+        ))
+
+    def test_incremental_rollups_match_rebuild(self):
+        admin = CustomUser.objects.create_user('clinician', password='pw', user_type='admin')
+        young = CustomUser.objects.create_user('young', password='pw', user_type='patient', age=8, gender='female')
+        old = CustomUser.objects.create_user('old', password='pw', user_type='patient', age=70, gender='male')
+        unregistered = CustomUser.objects.create_user('walkin', password='pw', user_type='patient')
+        PatientProfile.objects.create(user=young, registered_by=admin)
+        PatientProfile.objects.create(user=old, registered_by=admin)
+
+        start = timezone.make_aware(datetime(2026, 3, 1, 9, 15))
+        cases = [
+            (young, 'Flu', 'low', 0), (young, 'Flu ', 'low', 0.5), (old, 'Flu', 'low', 1),
+            (old, 'Pneumonia', 'high', 1), (unregistered, 'Flu', 'medium', 30), (old, 'Flu', 'low', 30),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for patient, disease, risk, hours in cases:
+                with mock.patch('django.utils.timezone.now', return_value=start + timedelta(hours=hours)):
+                    DiseasePrediction.objects.create(
+                        patient=patient, predicted_disease=disease, confidence_score=50, risk_level=risk,
+                        symptoms_analyzed=[], recommendations='', further_diagnostics='', ai_response='{}',
+                    )
+        incremental = self.rollups()
+        self.assertEqual(sum(row[-1] for row in incremental if row[0] == 'hour'), len(cases))
+        self.assertEqual(len({row[1] for row in incremental if row[0] == 'day'}), 2)
+
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+
+class SymptomVocabularyTests(TestCase):
+    """Synonym and spelling-insensitive mapping to canonical symptoms, and trie completions"""
+
+    def setUp(self):
+        reset_vocabulary()
+        self.addCleanup(reset_vocabulary)
+        self.fever = CanonicalSymptom.objects.get(name='Fever')
+
+    def test_synonyms_case_and_whitespace_map_to_the_canonical_symptom(self):
+        vocabulary = get_vocabulary('default')
+        for entry in ['Fever', 'fever ', '  FEVER', 'high temp', 'High   Temp', 'pyrexia']:
+            self.assertEqual(vocabulary.resolve(entry), self.fever.id, entry)
+        self.assertIsNone(vocabulary.resolve('clicking elbow'))
+
+    def test_completions_are_capped_and_deduplicated(self):
+        vocabulary = SymptomVocabulary([
+            (1, 'Fever', ['feverish', 'fever high']),
+            *[(i, f'Sore {i}', []) for i in range(2, 20)],
+        ])
+        self.assertEqual([s['id'] for s in vocabulary.complete('FEV')], [1])
+        self.assertEqual(len(vocabulary.complete('sore')), MAX_SUGGESTIONS)
+        self.assertEqual(len(vocabulary.complete('sore', limit=3)), 3)
+        self.assertEqual(vocabulary.complete('xyz'), [])
+
+    def test_canonicalize_before_bulk_create(self):
+        patient = CustomUser.objects.create_user('patient', password='pw', user_type='patient')
+        records = canonicalize([
+            SymptomRecord(patient=patient, symptom_name='fever ', duration_days=2),
+            SymptomRecord(patient=patient, symptom_name='High temp', duration_days=2),
+            SymptomRecord(patient=patient, symptom_name='Clicking elbow', duration_days=2),
+        ], using='default')
+        SymptomRecord.objects.bulk_create(records)
+        self.assertEqual(
+            list(SymptomRecord.objects.order_by('pk').values_list('canonical_symptom_id', flat=True)),
+            [self.fever.id, self.fever.id, None],
+        )
+
+
+class SearchTests(TestCase):
+    """Bag-of-words vs phrase matching and per-patient visibility of search results"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('clinician', password='pw', user_type='admin')
+        cls.alice = CustomUser.objects.create_user('alice', password='pw', user_type='patient')
+        cls.bob = CustomUser.objects.create_user('bob', password='pw', user_type='patient')
+        cls.exact = SymptomRecord.objects.create(patient=cls.alice, symptom_name='Pain', duration_days=2,
+                                                 notes='Sharp chest pain when breathing')
+        cls.scattered = SymptomRecord.objects.create(patient=cls.bob, symptom_name='Pain', duration_days=2,
+                                                     notes='Pain in the chest after running')
+        PatientProfile.objects.create(user=cls.bob, registered_by=cls.admin, medical_history='Childhood asthma')
+        DiseasePrediction.objects.create(
+            patient=cls.alice, predicted_disease='Dengue', confidence_score=60, risk_level='medium',
+            symptoms_analyzed=[], recommendations='', further_diagnostics='',
+            ai_response=json.dumps({'explanation': 'Consistent with dengue fever'}),
+        )
+
+    def hits(self, query, user=None):
+        return {(r['document'].doc_type, r['document'].object_id) for r in search(query, user or self.admin)}
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('"chest pain" fever'), ({'chest', 'pain', 'fever'}, [['chest', 'pain']]))
+        self.assertEqual(parse_query('"dengue"'), ({'dengue'}, []))
+        self.assertEqual(parse_query('"the asthma"'), ({'asthma'}, []))
+
+    def test_bag_of_words_matches_terms_in_any_order(self):
+        self.assertEqual(self.hits('chest pain'), {('symptom_note', self.exact.id), ('symptom_note', self.scattered.id)})
+
+    def test_phrase_requires_adjacent_terms(self):
+        self.assertEqual(self.hits('"chest pain"'), {('symptom_note', self.exact.id)})
+
+    def test_quoted_single_word_matches_like_the_bare_word(self):
+        self.assertEqual(len(self.hits('"dengue"')), 1)
+        self.assertEqual(self.hits('"dengue"'), self.hits('dengue'))
+        self.assertEqual(len(self.hits('"the asthma"')), 1)
+
+    def test_every_term_is_required(self):
+        self.assertEqual(self.hits('chest dengue'), set())
+
+    def test_patients_only_see_their_own_records(self):
+        self.assertEqual(self.hits('chest pain', user=self.alice), {('symptom_note', self.exact.id)})
+        self.assertEqual(self.hits('asthma', user=self.alice), set())
+        self.assertEqual(len(self.hits('asthma', user=self.bob)), 1)
+
+    def test_term_counts_follow_edits_and_deletes(self):
+        def count(term):
+            return SearchTerm.objects.filter(term=term).values_list('document_count', flat=True).first()
+
+        self.assertEqual(count('chest'), 2)
+        self.scattered.notes = 'Pain after running'
+        self.scattered.save()
+        self.assertEqual(count('chest'), 1)
+        self.exact.delete()
+        self.assertEqual(count('chest'), 0)
+        self.assertEqual(self.hits('chest'), set())
+
+    def test_admin_search_scores_only_top_impact_candidates(self):
+        with mock.patch('patients.search.MAX_CANDIDATES', 1), mock.patch('patients.search.MAX_CANDIDATE_DEPTH', 1):
+            self.assertEqual(self.hits('sharp pain'), {('symptom_note', self.exact.id)})
+            self.assertEqual(len(self.hits('pain')), 1)
+
+
+@override_settings(CLINIC_SHARDS=['test'])
+class ShardingTests(TestCase):
+    """Query routing, login across shards and moving a clinic with migrate_shards"""
+
+    databases = {'default', 'clinic_test'}
+
+    def create_clinic(self, using='default'):
+        admin = CustomUser.objects.db_manager(using).create_user('doc', password='pw', user_type='admin')
+        patient = CustomUser.objects.db_manager(using).create_user('pat', password='pw', user_type='patient')
+        PatientProfile.objects.using(using).create(user=patient, registered_by=admin, medical_history='Asthma')
+        symptom = SymptomRecord.objects.using(using).create(patient=patient, recorded_by=admin, symptom_name='Cough',
+                                                            duration_days=3, notes='Dry cough at night')
+        DiseasePrediction.objects.using(using).create(
+            patient=patient, predicted_by=admin, predicted_disease='Bronchitis', confidence_score=70,
+            risk_level='low', symptoms_analyzed=['Cough'], recommendations='', further_diagnostics='', ai_response='{}',
+        )
+        return admin, patient, symptom
+
+    def move(self, **options):
+        call_command('migrate_shards', move_admin='doc', clinic='test', stdout=StringIO(), **options)
+
+    def test_router_follows_the_current_shard(self):
+        router = ClinicShardRouter()
+        self.assertEqual(router.db_for_read(SymptomRecord), 'default')
+        with using_shard('clinic_test'):
+            self.assertEqual(router.db_for_read(SymptomRecord), 'clinic_test')
+            self.assertEqual(router.db_for_write(Session), 'default')
+        in_clinic = CustomUser.objects.db_manager('clinic_test').create_user('x', password='pw')
+        self.assertEqual(router.db_for_write(CustomUser, instance=in_clinic), 'clinic_test')
+        self.assertFalse(router.allow_relation(in_clinic, CustomUser.objects.create_user('y', password='pw')))
+
+    def test_login_routes_the_session_to_the_users_shard(self):
+        CustomUser.objects.db_manager('clinic_test').create_user('north', password='pw', user_type='patient')
+        CustomUser.objects.create_user('south', password='pw', user_type='patient')
+
+        self.client.post(reverse('login'), {'username': 'north', 'password': 'pw'})
+        self.assertEqual(self.client.session[SESSION_KEY], 'clinic_test')
+        response = self.client.get(reverse('patient_dashboard'))
+        self.assertEqual(response.wsgi_request.user.username, 'north')
+        self.assertEqual(response.wsgi_request.user._state.db, 'clinic_test')
+
+        self.client.logout()
+        self.client.post(reverse('login'), {'username': 'south', 'password': 'pw'})
+        self.assertEqual(self.client.session[SESSION_KEY], 'default')
+
+    def test_moved_account_wins_over_the_copy_left_in_default(self):
+        CustomUser.objects.create_user('doc', password='old', user_type='admin')
+        CustomUser.objects.db_manager('clinic_test').create_user('doc', password='new', user_type='admin')
+        self.assertFalse(self.client.login(username='doc', password='old'))
+        self.assertTrue(self.client.login(username='doc', password='new'))
+
+    def test_move_admin_remaps_keys(self):
+        # Occupy the first ids in the shard so every copied row gets a new primary key
+        CustomUser.objects.db_manager('clinic_test').create_user('someone', password='pw')
+        admin, patient, symptom = self.create_clinic()
+        self.move()
+
+        moved_admin = CustomUser.objects.using('clinic_test').get(username='doc')
+        moved_patient = CustomUser.objects.using('clinic_test').get(username='pat')
+        self.assertNotEqual(moved_patient.pk, patient.pk)
+        profile = PatientProfile.objects.using('clinic_test').get(user=moved_patient)
+        self.assertEqual(profile.registered_by_id, moved_admin.pk)
+        moved_symptom = SymptomRecord.objects.using('clinic_test').get(patient=moved_patient)
+        self.assertEqual(moved_symptom.recorded_by_id, moved_admin.pk)
+        self.assertEqual(moved_symptom.recorded_date, symptom.recorded_date)
+        prediction = DiseasePrediction.objects.using('clinic_test').get(patient=moved_patient)
+        self.assertEqual(prediction.predicted_by_id, moved_admin.pk)
+        with using_shard('clinic_test'):
+            self.assertEqual(len(search('cough', moved_admin, using='clinic_test')), 1)
+        self.assertTrue(CustomUser.objects.filter(username='pat').exists())
+
+    def test_delete_source_after_a_move_only_purges(self):
+        self.create_clinic()
+        self.move()
+        self.move(delete_source=True)
+        self.assertFalse(CustomUser.objects.filter(username__in=['doc', 'pat']).exists())
+        self.assertEqual(SymptomRecord.objects.using('clinic_test').count(), 1)
+        self.assertEqual(CustomUser.objects.using('clinic_test').count(), 2)
@@ -1,9 +1,11 @@
 from django.urls import path
-from . import views
+from . import views, api
 
 urlpatterns = [
     # Admin URLs
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/analytics/', views.analytics_dashboard, name='analytics_dashboard'),
+    path('admin/metrics/admission/', views.admission_metrics, name='admission_metrics'),
     path('admin/register-patient/', views.register_patient, name='register_patient'),
     path('admin/patient/<int:patient_id>/', views.view_patient, name='view_patient'),
     path('admin/patient/<int:patient_id>/add-symptoms/', views.add_symptoms, name='add_symptoms'),
@@ -13,6 +15,18 @@ urlpatterns = [
     path('patient/dashboard/', views.patient_dashboard, name='patient_dashboard'),
     
     # Shared URLs
+    path('search/', views.search_records, name='search_records'),
     path('prediction/<int:prediction_id>/', views.view_prediction, name='view_prediction'),
+    path('prediction/<int:prediction_id>/report.pdf', views.prediction_report, name='prediction_report'),
     path('symptom/<int:symptom_id>/delete/', views.delete_symptom, name='delete_symptom'),
+    path('symptom/autocomplete/', views.symptom_autocomplete, name='symptom_autocomplete'),
+    
+    # JSON API
+    path('api/patients/', api.patient_list, name='api_patient_list'),
+    path('api/patients/<int:patient_id>/', api.patient_detail, name='api_patient_detail'),
+    path('api/patients/<int:patient_id>/symptoms/', api.patient_symptoms, name='api_patient_symptoms'),
+    path('api/patients/<int:patient_id>/predictions/', api.patient_predictions, name='api_patient_predictions'),
+    path('api/patients/<int:patient_id>/changes/', api.patient_changes, name='api_patient_changes'),
+    path('api/symptoms/<int:symptom_id>/', api.symptom_detail, name='api_symptom_detail'),
+    path('api/predictions/<int:prediction_id>/', api.prediction_detail, name='api_prediction_detail'),
 ]
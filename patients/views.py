@@ -1,16 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import timedelta
 from accounts.models import CustomUser
 from accounts.forms import PatientRegistrationForm
-from .models import PatientProfile, SymptomRecord, DiseasePrediction
-from .forms import SymptomRecordForm
+from medaid.admission import Overloaded, admission_control, admit, metrics, overloaded_response, wants_json
+from medaid.sharding import clinic_aliases
+from .models import PatientProfile, SymptomRecord, DiseasePrediction, PredictionRollup, SearchDocument
+from .forms import SymptomRecordFormSet
 from .ai_service import predict_disease_with_ai
+from .audit import audit
+from .reports import ReportUnavailable, get_report
+from .search import attach_sources, parse_query, search
+from .rollups import bucket_start
+from .signals import symptoms_bulk_created
+from .similarity import get_similarity_index
+from .vocabulary import canonicalize, get_vocabulary
 
 
 @login_required
+@admission_control('light')
 def admin_dashboard(request):
     """Admin dashboard - view all patients"""
     if request.user.user_type != 'admin':
@@ -68,38 +83,105 @@ def register_patient(request):
 
 @login_required
 def add_symptoms(request, patient_id):
-    """Admin adds symptoms for a specific patient"""
+    """Admin adds one or more symptoms for a specific patient"""
     if request.user.user_type != 'admin':
         messages.error(request, 'Access denied. Admin only.')
         return redirect('patient_dashboard')
     
     patient = get_object_or_404(CustomUser, id=patient_id, user_type='patient')
-    existing_symptoms = SymptomRecord.objects.filter(patient=patient)
     
     if request.method == 'POST':
-        form = SymptomRecordForm(request.POST)
-        if form.is_valid():
-            symptom = form.save(commit=False)
-            symptom.patient = patient
-            symptom.recorded_by = request.user
-            symptom.save()
-            messages.success(request, f'Symptom "{symptom.symptom_name}" added successfully!')
+        formset = SymptomRecordFormSet(request.POST)
+        if formset.is_valid():
+            records = []
+            for form in formset:
+                if not form.has_changed():
+                    continue
+                symptom = form.save(commit=False)
+                symptom.patient = patient
+                symptom.recorded_by = request.user
+                records.append(symptom)
+            
+            if records:
+                using = patient._state.db
+                with transaction.atomic(using=using):
+                    records = SymptomRecord.objects.using(using).bulk_create(canonicalize(records, using=using))
+                    symptoms_bulk_created.send(sender=SymptomRecord, patient=patient, records=records, using=using)
+                for record in records:
+                    audit(request, 'create', 'symptom', record.id, patient.id)
+                names = ', '.join(f'"{r.symptom_name}"' for r in records)
+                messages.success(request, f'Symptom{"s" if len(records) > 1 else ""} {names} added successfully!')
             
             action = request.POST.get('action')
-            if action == 'add_more':
-                return redirect('add_symptoms', patient_id=patient_id)
-            elif action == 'generate_prediction':
-                return redirect('generate_prediction', patient_id=patient_id)
+            if action == 'predict_now':
+                symptoms = SymptomRecord.objects.filter(patient=patient)
+                if symptoms.exists():
+                    return _run_prediction(request, patient, symptoms, from_symptom_form=True)
+                messages.error(request, 'No symptoms recorded for this patient. Please add symptoms first.')
+            elif not records:
+                messages.warning(request, 'No symptoms entered.')
+            return redirect('add_symptoms', patient_id=patient_id)
     else:
-        form = SymptomRecordForm()
+        formset = SymptomRecordFormSet()
+    
+    existing_symptoms = list(SymptomRecord.objects.filter(patient=patient))
     
     return render(request, 'patients/add_symptoms.html', {
-        'form': form,
+        'formset': formset,
         'patient': patient,
         'existing_symptoms': existing_symptoms,
+        'shard': patient._state.db,
     })
 
 
+def _run_prediction(request, patient, symptoms, from_symptom_form=False):
+    """Call the AI service for a patient's symptoms and store the resulting prediction"""
+    symptom_list = []
+    for symptom in symptoms:
+        symptom_list.append({
+            'name': symptom.symptom_name,
+            'severity': symptom.get_severity_display(),
+            'duration': symptom.duration_days
+        })
+    
+    try:
+        # Gemini calls are slow; the heavy pool keeps them from starving the light views
+        with admit('heavy'):
+            result, ai_response = predict_disease_with_ai(
+                symptoms_list=symptom_list,
+                patient_age=patient.age or 30,
+                patient_gender=patient.gender,
+                duration_days=max([s.duration_days for s in symptoms])
+            )
+        
+        prediction = DiseasePrediction.objects.create(
+            patient=patient,
+            predicted_disease=result.get('primary_diagnosis', 'Unknown'),
+            confidence_score=result.get('confidence_percentage', 0),
+            risk_level=result.get('risk_level', 'medium'),
+            symptoms_analyzed=symptom_list,
+            recommendations='\n'.join(result.get('lifestyle_recommendations', [])),
+            further_diagnostics='\n'.join(result.get('recommended_tests', [])),
+            specialist_referral=result.get('specialist_referral', ''),
+            ai_response=ai_response,
+            predicted_by=request.user
+        )
+        
+        messages.success(request, 'Disease prediction generated successfully!')
+        return redirect('view_prediction', prediction_id=prediction.id)
+        
+    except Overloaded as e:
+        if from_symptom_form and not wants_json(request):
+            # Going back to the symptoms form would submit them a second time
+            messages.warning(request, 'The AI service is busy right now. The symptoms were saved; '
+                                      'please try generating the prediction again in a moment.')
+            return redirect('generate_prediction', patient_id=patient.id)
+        return overloaded_response(request, e)
+    except Exception as e:
+        messages.error(request, f'Error generating prediction: {str(e)}')
+        return redirect('add_symptoms', patient_id=patient.id)
+
+
 @login_required
 def generate_prediction(request, patient_id):
     """Generate disease prediction using AI"""
@@ -115,41 +197,7 @@ def generate_prediction(request, patient_id):
         return redirect('add_symptoms', patient_id=patient_id)
     
     if request.method == 'POST':
-        symptom_list = []
-        for symptom in symptoms:
-            symptom_list.append({
-                'name': symptom.symptom_name,
-                'severity': symptom.get_severity_display(),
-                'duration': symptom.duration_days
-            })
-        
-        try:
-            result, ai_response = predict_disease_with_ai(
-                symptoms_list=symptom_list,
-                patient_age=patient.age or 30,
-                patient_gender=patient.gender,
-                duration_days=max([s.duration_days for s in symptoms])
-            )
-            
-            prediction = DiseasePrediction.objects.create(
-                patient=patient,
-                predicted_disease=result.get('primary_diagnosis', 'Unknown'),
-                confidence_score=result.get('confidence_percentage', 0),
-                risk_level=result.get('risk_level', 'medium'),
-                symptoms_analyzed=symptom_list,
-                recommendations='\n'.join(result.get('lifestyle_recommendations', [])),
-                further_diagnostics='\n'.join(result.get('recommended_tests', [])),
-                specialist_referral=result.get('specialist_referral', ''),
-                ai_response=ai_response,
-                predicted_by=request.user
-            )
-            
-            messages.success(request, 'Disease prediction generated successfully!')
-            return redirect('view_prediction', prediction_id=prediction.id)
-            
-        except Exception as e:
-            messages.error(request, f'Error generating prediction: {str(e)}')
-            return redirect('add_symptoms', patient_id=patient_id)
+        return _run_prediction(request, patient, symptoms)
     
     return render(request, 'patients/generate_prediction.html', {
         'patient': patient,
@@ -158,6 +206,7 @@ def generate_prediction(request, patient_id):
 
 
 @login_required
+@admission_control('light')
 def view_prediction(request, prediction_id):
     """View detailed prediction results"""
     prediction = get_object_or_404(DiseasePrediction, id=prediction_id)
@@ -166,6 +215,8 @@ def view_prediction(request, prediction_id):
         messages.error(request, 'Access denied.')
         return redirect('patient_dashboard')
     
+    audit(request, 'view', 'prediction', prediction.id, prediction.patient_id)
+    
     try:
         import json
         ai_data = json.loads(prediction.ai_response)
@@ -179,6 +230,42 @@ def view_prediction(request, prediction_id):
 
 
 @login_required
+def prediction_report(request, prediction_id):
+    """Download a prediction as PDF, served from the content-addressed report cache"""
+    prediction = get_object_or_404(DiseasePrediction.objects.select_related('patient'), id=prediction_id)
+    
+    if request.user.user_type == 'patient' and prediction.patient != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('patient_dashboard')
+    
+    try:
+        path, key = get_report(prediction)
+    except ReportUnavailable as e:
+        messages.error(request, f'PDF reports are unavailable: {e}')
+        return redirect('view_prediction', prediction_id=prediction_id)
+    except FuturesTimeoutError:
+        # The render keeps going in the background and lands in the cache
+        messages.warning(request, 'The PDF report is still being generated. Please try again in a minute.')
+        return redirect('view_prediction', prediction_id=prediction_id)
+    except Exception as e:
+        messages.error(request, f'Error generating PDF report: {str(e)}')
+        return redirect('view_prediction', prediction_id=prediction_id)
+    
+    audit(request, 'download', 'prediction', prediction.id, prediction.patient_id)
+    
+    etag = f'"{key}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+    
+    response = FileResponse(open(path, 'rb'), content_type='application/pdf',
+                            filename=f'medaid-prediction-{prediction.id}.pdf')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+@login_required
+@admission_control('light')
 def patient_dashboard(request):
     """Patient dashboard - view own health records"""
     if request.user.user_type != 'patient':
@@ -193,6 +280,8 @@ def patient_dashboard(request):
     symptoms = SymptomRecord.objects.filter(patient=request.user).order_by('-recorded_date')
     predictions = DiseasePrediction.objects.filter(patient=request.user).order_by('-prediction_date')
     
+    audit(request, 'view', 'dashboard', request.user.id, request.user.id)
+    
     return render(request, 'patients/patient_dashboard.html', {
         'profile': profile,
         'symptoms': symptoms,
@@ -204,6 +293,7 @@ def patient_dashboard(request):
 
 
 @login_required
+@admission_control('light')
 def view_patient(request, patient_id):
     """Admin views detailed patient information"""
     if request.user.user_type != 'admin':
@@ -215,11 +305,21 @@ def view_patient(request, patient_id):
     symptoms = SymptomRecord.objects.filter(patient=patient)
     predictions = DiseasePrediction.objects.filter(patient=patient)
     
+    audit(request, 'view', 'patient', patient.id, patient.id)
+    
+    matches = get_similarity_index().similar_patients(patient.id, k=5)
+    similar_users = CustomUser.objects.in_bulk([patient_id for patient_id, _ in matches])
+    similar_patients = [
+        {'patient': similar_users[patient_id], 'similarity': round(score * 100)}
+        for patient_id, score in matches if patient_id in similar_users
+    ]
+    
     return render(request, 'patients/view_patient.html', {
         'patient': patient,
         'profile': profile,
         'symptoms': symptoms,
         'predictions': predictions,
+        'similar_patients': similar_patients,
     })
 
 
@@ -231,6 +331,7 @@ def delete_symptom(request, symptom_id):
     
     if request.user.user_type == 'admin' or symptom.patient == request.user:
         patient_id = symptom.patient.id
+        audit(request, 'delete', 'symptom', symptom.id, patient_id)
         symptom.delete()
         messages.success(request, 'Symptom deleted successfully.')
         
@@ -240,3 +341,92 @@ def delete_symptom(request, symptom_id):
         messages.error(request, 'Access denied.')
     
     return redirect('patient_dashboard')
+
+
+@login_required
+@admission_control('light')
+def analytics_dashboard(request):
+    """Admin epidemiology dashboard - reads only the pre-aggregated rollups"""
+    if request.user.user_type != 'admin':
+        messages.error(request, 'Access denied. Admin only.')
+        return redirect('patient_dashboard')
+    
+    period = request.GET.get('period', 'day')
+    if period not in dict(PredictionRollup.PERIOD_CHOICES):
+        period = 'day'
+    try:
+        span = max(1, min(int(request.GET.get('span', 30 if period == 'day' else 48)), 366))
+    except ValueError:
+        span = 30 if period == 'day' else 48
+    
+    step = timedelta(days=1) if period == 'day' else timedelta(hours=1)
+    since = bucket_start(timezone.now(), period) - step * (span - 1)
+    rollups = PredictionRollup.objects.filter(period=period, bucket__gte=since)
+    
+    def breakdown(field, limit=None):
+        rows = rollups.values(field).annotate(total=Sum('count')).order_by('-total')
+        return list(rows[:limit] if limit else rows)
+    
+    by_admin = breakdown('registered_by')
+    admins = CustomUser.objects.in_bulk([row['registered_by'] for row in by_admin if row['registered_by']])
+    for row in by_admin:
+        admin_user = admins.get(row['registered_by'])
+        row['name'] = (admin_user.get_full_name() or admin_user.username) if admin_user else 'Unassigned'
+    
+    timeline = list(rollups.values('bucket').annotate(total=Sum('count')).order_by('bucket'))
+    peak = max([row['total'] for row in timeline], default=0)
+    for row in timeline:
+        row['percent'] = round(row['total'] * 100 / peak) if peak else 0
+    
+    return render(request, 'patients/analytics_dashboard.html', {
+        'period': period,
+        'span': span,
+        'since': since,
+        'total_predictions': sum(row['total'] for row in timeline),
+        'timeline': timeline,
+        'by_disease': breakdown('predicted_disease', limit=10),
+        'by_risk': breakdown('risk_level'),
+        'by_gender': breakdown('gender'),
+        'by_age_band': breakdown('age_band'),
+        'by_admin': by_admin,
+    })
+
+
+def symptom_autocomplete(request):
+    """Prefix suggestions from the in-memory symptom vocabulary - no database query.
+
+    The page passes its shard explicitly; resolving it from the session would
+    cost a session lookup on every keystroke.
+    """
+    prefix = request.GET.get('q', '')
+    shard = request.GET.get('shard')
+    using = shard if shard in clinic_aliases() else 'default'
+    results = get_vocabulary(using).complete(prefix) if prefix.strip() else []
+    return JsonResponse({'results': results})
+
+
+@login_required
+def search_records(request):
+    """Full-text search over symptom notes, medical history and AI explanations"""
+    query = request.GET.get('q', '').strip()
+    doc_types = [t for t in request.GET.getlist('type') if t in dict(SearchDocument.DOC_TYPE_CHOICES)]
+    
+    results = []
+    if query:
+        terms, _ = parse_query(query)
+        results = attach_sources(search(query, request.user, doc_types=doc_types), terms)
+    
+    return render(request, 'patients/search.html', {
+        'query': query,
+        'results': results,
+        'doc_types': SearchDocument.DOC_TYPE_CHOICES,
+        'selected_types': doc_types,
+    })
+
+
+@login_required
+def admission_metrics(request):
+    """Admission pool counters for this worker process, for monitoring"""
+    if request.user.user_type != 'admin':
+        return JsonResponse({'error': 'Admin only.'}, status=403)
+    return JsonResponse({'pools': metrics()})
@@ -0,0 +1,102 @@
+import threading
+
+MAX_SUGGESTIONS = 10
+
+
+def normalize_term(term):
+    """Case- and whitespace-insensitive form used for all vocabulary lookups"""
+    return ' '.join(term.lower().split())
+
+
+class SymptomTrie:
+    """Prefix trie over canonical symptom names and their synonyms.
+
+    Every node caches up to MAX_SUGGESTIONS completions, so a lookup costs one
+    dict step per typed character and never walks the subtree.
+    """
+
+    def __init__(self):
+        self.root = {'children': {}, 'suggestions': []}
+
+    def insert(self, term, entry):
+        node = self.root
+        self._offer(node, entry)
+        for char in term:
+            node = node['children'].setdefault(char, {'children': {}, 'suggestions': []})
+            self._offer(node, entry)
+
+    @staticmethod
+    def _offer(node, entry):
+        suggestions = node['suggestions']
+        if len(suggestions) < MAX_SUGGESTIONS and all(s['id'] != entry['id'] for s in suggestions):
+            suggestions.append(entry)
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        node = self.root
+        for char in normalize_term(prefix):
+            node = node['children'].get(char)
+            if node is None:
+                return []
+        return node['suggestions'][:limit]
+
+
+class SymptomVocabulary:
+    """Canonical symptoms loaded once per process: exact term lookup plus prefix trie"""
+
+    def __init__(self, symptoms):
+        self.by_term = {}
+        self.trie = SymptomTrie()
+        terms = []
+        for symptom_id, name, synonyms in symptoms:
+            for term in [name, *synonyms]:
+                normalized = normalize_term(term)
+                if normalized and normalized not in self.by_term:
+                    self.by_term[normalized] = symptom_id
+                    terms.append((normalized, {'id': symptom_id, 'name': name, 'match': term}))
+        # Sorted insertion makes each node's cached suggestions the alphabetically first matches
+        for normalized, entry in sorted(terms, key=lambda item: item[0]):
+            self.trie.insert(normalized, entry)
+
+    def resolve(self, symptom_name):
+        """Canonical symptom id for a free-text entry, or None if it is not in the vocabulary"""
+        return self.by_term.get(normalize_term(symptom_name))
+
+    def complete(self, prefix, limit=MAX_SUGGESTIONS):
+        return self.trie.complete(prefix, limit)
+
+
+# One vocabulary per database - canonical ids are only meaningful within their clinic shard
+_vocabularies = {}
+_lock = threading.Lock()
+
+
+def get_vocabulary(using=None):
+    from medaid.sharding import current_shard
+
+    using = using or current_shard()
+    vocabulary = _vocabularies.get(using)
+    if vocabulary is None:
+        with _lock:
+            vocabulary = _vocabularies.get(using)
+            if vocabulary is None:
+                from .models import CanonicalSymptom
+                rows = CanonicalSymptom.objects.using(using).values_list('id', 'name', 'synonyms')
+                vocabulary = _vocabularies[using] = SymptomVocabulary(rows)
+    return vocabulary
+
+
+def reset_vocabulary(using=None):
+    """Drop cached vocabularies; they are reloaded on next use"""
+    with _lock:
+        if using is None:
+            _vocabularies.clear()
+        else:
+            _vocabularies.pop(using, None)
+
+
+def canonicalize(records, using=None):
+    """Attach canonical symptom ids to unsaved SymptomRecords, e.g. before bulk_create()"""
+    vocabulary = get_vocabulary(using)
+    for record in records:
+        record.canonical_symptom_id = vocabulary.resolve(record.symptom_name)
+    return records